@@ -16,8 +16,12 @@ from namedAlarmComponent import namedAlarmComponent
 
 class beastComponent(namedAlarmComponent):
     '''
-    Class to handle a node in the alarm tree hierarchy in BEAST 
+    Class to handle a node in the alarm tree hierarchy in BEAST. The attribute 
+    lists of the components without attributes are all the same empty tuple.
+    Setting the attributes forgets the fingerprints, but the lists and the PV map 
+    changed in place need a call to invalidateFingerprint().
     '''
+    __slots__ = ("component_id", "parent_cmpnt_id", "config_time", "guidanceRows", "commandRows", "actionRows", "displayRows", "pvMap")
    
     def __init__(self, compID=None, parent=None):
         '''
@@ -29,23 +33,90 @@ class beastComponent(namedAlarmComponent):
         self.parent_cmpnt_id        = None      # paprent_id in the alarm hierarchy tree
         self.config_time            = None      # type in the alarm hierarchy tree
         
-        if( self.parentSys != None ) :
+        if( self.parentSys is not None ) :
             self.parent_cmpnt_id = parent.component_id
             
-        self.guidance       = []
-        self.command        = []
-        self.automatedAction= []
-        self.display        = []
+        self.guidance       = ()
+        self.command        = ()
+        self.automatedAction= ()
+        self.display        = ()
         self.pv             = None
+        return
         
-        '''Define the list of main attributes using which the two component would be considered equal or not'''
-        self.mainAttributes = {"name"               :   self.name, 
-                               "guidance"           :   self.guidance, 
-                               "command"            :   self.command,
-                               "automatedAction"    :   self.automatedAction, 
-                               "display"            :   self.display, 
-                               "pv"                 :   self.pv }
+    
+    def getGuidance(self):
+        return self.guidanceRows
+
+    def setGuidance(self, guidance):
+        self.guidanceRows = guidance
+        self.invalidateFingerprint()
+        return
+
+    guidance = property( getGuidance, setGuidance )
+
+    def getCommand(self):
+        return self.commandRows
+
+    def setCommand(self, command):
+        self.commandRows = command
+        self.invalidateFingerprint()
+        return
+
+    command = property( getCommand, setCommand )
+
+    def getAutomatedAction(self):
+        return self.actionRows
+
+    def setAutomatedAction(self, automatedAction):
+        self.actionRows = automatedAction
+        self.invalidateFingerprint()
+        return
+
+    automatedAction = property( getAutomatedAction, setAutomatedAction )
+
+    def getDisplay(self):
+        return self.displayRows
+
+    def setDisplay(self, display):
+        self.displayRows = display
+        self.invalidateFingerprint()
         return
+
+    display = property( getDisplay, setDisplay )
+
+    def getPV(self):
+        return self.pvMap
+
+    def setPV(self, pvAttributes):
+        self.pvMap = pvAttributes
+        self.invalidateFingerprint()
+        return
+
+    pv = property( getPV, setPV )
+
+
+    def getMainAttributes(self):
+        '''
+        Define the list of main attributes using which the two component would be considered equal or not. 
+        The map is made from the current values of the attributes. The components without PV 
+        have either None or an empty map for it depending on where they come from, both count as None.
+        The attribute rows are kept in lists or tuples, they are always given as tuples here.
+        '''
+        pvAttributes = self.pv
+        if( not pvAttributes ):
+            pvAttributes = None
+        return {"name"               :   self.name, 
+                "guidance"           :   tuple( self.guidance ), 
+                "command"            :   tuple( self.command ),
+                "automatedAction"    :   tuple( self.automatedAction ), 
+                "display"            :   tuple( self.display ), 
+                "pv"                 :   pvAttributes }
+    
+    mainAttributes = property( getMainAttributes )
+
+    def getFingerprintContent(self):
+        """ The fingerprint is made from the main attributes """
+        return self.mainAttributes
         
             
     
@@ -79,7 +150,7 @@ class beastComponent(namedAlarmComponent):
                        
     def getFullIdentity(self):
         '''returns a list of the main attributes including the attributes of the parent'''
-        if( self.parentSys == None ):
+        if( self.parentSys is None ):
             return [self.mainAttributes]
         else:
             return self.parentSys.getFullIdentity().append( self.mainAttributes )
@@ -104,64 +175,18 @@ class beastComponent(namedAlarmComponent):
             attributeList.append( child.mainAttributes )
         return attributeList
         
-    def findNewComponents(self, component):
+    def getChangedAttributes(self, component):
         """
-        Find new components in the 'component' and return a map 
-        with all the new components that are not in self component. 
-        The key is going to be the full path to the new components.
-        Here we assume that the only parameter that define the identity 
-        of the component is its name and that a component cannot have the two children 
-        with the same name. The fact that the names are same does not mean 
-        that the components are the same. 
+        Return the sorted list of names of the main attributes that differ between 
+        this component and the 'component' with the same name 
         """
-        newCompDict = {}
-        if( component == None ):
-            return newCompDict
-        
-        if( self.mainAttributes != component.mainAttributes ):
-            newCompDict[component.getFullPath()] = component
-            return newCompDict
-
-        if( len(component.children) > 0 ):
-            for othersChild in component.children:
-                if( othersChild.mainAttributes not in self.getChildrenMainAttributes()  ) :
-                    newCompDict[othersChild.getFullName()] = othersChild
-                else :
-                    newCompsInChild = self.getChildByAttributes( othersChild.mainAttributes ).findNewComponents( othersChild )
-                    if( len(newCompsInChild) > 0 ) :
-                        newCompDict.update( newCompsInChild )
-        return newCompDict
-        
-    def findMissingComponents(self, component):
-        missingCompDict = {}
-        if( component == None ):
-            missingCompDict[self.getFullPath()] = self
-            return missingCompDict
-
-        if( self.mainAttributes != component.mainAttributes ):
-            missingCompDict[self.getFullPath()] = self
-            return missingCompDict
-
-        if( len(self.children) > 0 ) :
-            for ownChild in self.children:
-                if( ownChild.mainAttributes not in component.getChildrenMainAttributes() ) :
-                    missingCompDict[ownChild.getFullName()] = ownChild
-                else :
-                    missCompsInChild = self.getChildByAttributes( ownChild.mainAttributes ).findMissingComponents( component.getChildByAttributes( ownChild.mainAttributes ) )
-                    if( len(missCompsInChild) > 0 ) :
-                        missingCompDict.update( missCompsInChild )
-                    
-        return missingCompDict
-    
-    def __eq__(self, component ):
-        if( len( self.findMissingComponents(component) ) != 0 or len( self.findNewComponents(component) ) != 0  ):
-            return False
-        return True
-    
-    def __ne__(self, component ):
-        if( len( self.findMissingComponents(component) ) == 0 and len( self.findNewComponents(component) ) == 0  ):
-            return False
-        return True
+        ownAttributes = self.mainAttributes
+        othersAttributes = component.mainAttributes
+        changedAttributes = []
+        for attribName in sorted( ownAttributes.keys() ):
+            if( ownAttributes[attribName] != othersAttributes[attribName] ):
+                changedAttributes.append( attribName )
+        return changedAttributes
 
     
 # End of "beastComponent" class definition
@@ -11,20 +11,55 @@ base class.
 import lxml.etree
 
 from beastComponent import beastComponent
+from componentIDAllocator import componentIDAllocator
 
 
 
 
 class beastComponentFromSQLite(beastComponent):
     '''
-    Class to handle a node in the alarm tree hierarchy in BEAST with an access to DB 
+    Class to handle a node in the alarm tree hierarchy in BEAST with an access to DB. 
+    The PV attributes other than the description are the same for all channels, so 
+    only the description is kept in each component.
     '''
+    __slots__ = ("subsys", "idAllocator", "type", "pvDescription", "pvCustom")
     
+    # PV attributes that are the same for all voltage channels
+    pvDefaults = {"ENABLED_IND"            :   1, 
+                  "ANNUNCIATE_IND"         :   'true', 
+                  "LATCH_IND"              :   'true', 
+                  "DELAY"                  :   2, 
+                  "DELAY_COUNT"            :   0, 
+                  "FILTER"                 :   "",
+                  "ACT_GLOBAL_ALARM_IND"   :   0}
+
+    ''' 
+    A dictionary for translating the names of the columns in the MySQL PV table and the 
+    tag name in the corresponding "pv" tag in the XML file created from BEAST MySQL DB. 
+    '''             
+    xmlTagName = {"DESCR"               :   "description", 
+                  "ENABLED_IND"         :   "enabled", 
+                  "ANNUNCIATE_IND"      :   "annunciating", 
+                  "LATCH_IND"           :   "latching", 
+                  "DELAY"               :   "delay", 
+                  "DELAY_COUNT"         :   "count", 
+                  "FILTER"              :   "filter"
+    }
+
+    # Tags and keys of the rows for the entries of the PV tags, in the order they are written
+    xmlEntryTags = [ ("guidance",           "guidance",         ("TITLE", "DETAIL")), 
+                     ("display",            "display",          ("TITLE", "DETAIL")), 
+                     ("command",            "command",          ("TITLE", "DETAIL")), 
+                     ("automatedAction",    "automated_action", ("TITLE", "DETAIL", "DELAY")) ]
+    xmlEntryChildTags = {"TITLE" : "title", "DETAIL" : "details", "DELAY" : "delay"}
+    
+    # The characters that makeXMLText writes itself (printable ASCII), for anything else lxml is used
+    xmlPlainCharacters = "".join( [ chr(charCode) for charCode in xrange( 0x20, 0x7f ) ] )
+    pvTemplates = {}    # Templates of the pv tags made by makePVTemplate, by the structure of the tag
+
     displayDict        = {}     # Detector specific map for OPI file names
     displayDictSTD     = {}     # Detector-independent map for OPI file names
 
-    componentID = 0;            # component_id for this class
-    
     @classmethod
     def copyComponent(cls, component, parent ):
         """
@@ -32,19 +67,13 @@ class beastComponentFromSQLite(beastComponent):
         a different parent in general. Returns the instance of the 
         newly created component
         """
-        newComp = beastComponentFromSQLite( component.subsys, component.component_id, parent )
+        newComp = beastComponentFromSQLite( component.subsys, component.component_id, parent, False, component.idAllocator )
         for child in component.children:
             newChild = beastComponentFromSQLite.copyComponent(child, newComp)
-            newComp.children.append(newChild)
+            newComp.addChild(newChild)
         return newComp   
     
         
-    @classmethod
-    def getNextComponentID(cls):
-        """Calculate the next component_id for this tree"""
-        beastComponentFromSQLite.componentID += 1
-        return beastComponentFromSQLite.componentID
-       
     @classmethod
     def initDisplayDictionaries(cls):
         """ Initialize the display name maps """
@@ -63,13 +92,21 @@ class beastComponentFromSQLite(beastComponent):
         return 0
 
    
-    def __init__(self, inSubsystem, compID=None, parent=None ):
-        beastComponent.__init__(self, beastComponentFromSQLite.getNextComponentID(), parent)
+    def __init__(self, inSubsystem, compID=None, parent=None, buildTree=True, idAllocator=None ):
+        beastComponent.__init__(self, None, parent)
         '''
-        Constructor for the class. Creates the object, then to create objects for the children.
-        That function will call the constructor for children, so the process will go recursively. 
+        Constructor for the class. Creates the object, then builds the tree of its children 
+        from the children of the subsystem unless buildTree is False. The COMPONENT_ID is 
+        taken from idAllocator, or from the allocator of the parent if it is not given. 
+        A root without an allocator gets its own, so its IDs start from 1 in every build. 
         '''        
         self.subsys             = inSubsystem  
+        self.idAllocator        = idAllocator
+        if( self.idAllocator == None ):
+            if( parent is not None ):
+                self.idAllocator = parent.idAllocator
+            else:
+                self.idAllocator = componentIDAllocator()
                         
 #        print "Creating a component with {0} elements and COMPONENT_ID {1}".format( len(self.subsys.children), self.component_id)
         self.name               = inSubsystem.name
@@ -77,17 +114,19 @@ class beastComponentFromSQLite(beastComponent):
         self.type               = inSubsystem.type
         
         
+        # In case it is the last leaf on the branch the name should be the PV name (with alarm) 
+        # to match what comes out from the BEAST MYSQL database
+        if( len( self.subsys.children ) == 0  ) :
+            self.name = inSubsystem.getAlarmPVName()
+ 
+        self.component_id       = self.idAllocator.getNextID()
+        
         # If cannot find the requested component in the DB then raise an exception 
         if( self.component_id == 0 ) :
             errMsg = "Bad alarm tree hierarchy <{0}>".format( compID )
             print errMsg
             raise Exception( errMsg )
  
-        # In case it is the last leaf on the branch the name should be the PV name (with alarm) 
-        # to match what comes out from the BEAST MYSQL database
-        if( len( self.subsys.children ) == 0  ) :
-            self.name = inSubsystem.getAlarmPVName()
- 
         self.getGuidances()
         self.getDisplays()
         
@@ -95,54 +134,54 @@ class beastComponentFromSQLite(beastComponent):
             self.getPVattributes()
  
         # Keep going to find the children
-        for subSysChild in self.subsys.children :
-            self.children.append( beastComponentFromSQLite( subSysChild, None, self ) )
+        if( buildTree ):
+            self.buildSubtree()
  
 #        print "Finished creating component ", self.getFullPath("/"), " pv name is ", self.getAlarmPVName()
         return
 
 
+    def findChildItems(self):
+        return self.subsys.children
+
+    def makeChild(self, subSysChild):
+        return beastComponentFromSQLite( subSysChild, None, self, False, self.idAllocator )
+
+    def getTreeKey(self):
+        return id( self.subsys )
+
+
     def getDetector(self):
         """
         Find the detector above this subsystem in the tree.
         Uses the fact that the type for the detector node should have "Detector" 
-        in the corresponding SQLite database entry. 
+        in the corresponding SQLite database entry. The result is cached in the nodes.
         """
-        if( self.type ==  'Detector' ):
-            return self
-            if( self.parentSys == None ):
-                return None
-        else:
-            return self.parentSys.getDetector()
+        return self.findCachedAncestor( "detector", lambda comp: comp.type == 'Detector' )
         
     def getSystem(self):
         """
         Find the detector above this subsystem in the tree.
         Uses the fact that the type for the detector node should have "Voltage type" 
-        in the corresponding SQLite database entry. 
+        in the corresponding SQLite database entry. The result is cached in the nodes.
         """
-        if( self.type ==  'Voltage type' ):
-            return self
-        else:
-            if( self.parentSys == None ):
-                return None
-            return self.parentSys.getSystem()
+        return self.findCachedAncestor( "system", lambda comp: comp.type == 'Voltage type' )
    
     def getGuidances(self):
         '''
         Set the guidance dictionary
         '''
         detector = self.getDetector()
-        if( detector == None ) :
+        if( detector is None ) :
             return 
         suggestedAction = "Try to reset the voltage channel for " + \
             self.name.replace( ":alarm", "" ).replace(":", "->") + " . "
         suggestedAction += "You can use the associated screen to access voltage parameters for this channel. "
         suggestedAction += "If the problem still persists contact expert for " + detector.name + " detector."
         guideLine = {"TITLE"            :   "Guidance", 
-                     "GUIDANCE_ORDER"   :   "0", 
+                     "GUIDANCE_ORDER"   :   0, 
                      "DETAIL"           :   suggestedAction}
-        self.guidance.append( guideLine )
+        self.guidance = ( guideLine, )
         return
 
 
@@ -153,11 +192,11 @@ class beastComponentFromSQLite(beastComponent):
         relatedDisplayName = ""
         
         detector = self.getDetector()
-        if( detector == None ) :
+        if( detector is None ) :
             return
 
         system = self.getSystem()
-        if( system == None ):
+        if( system is None ):
             return
         
         if( detector.name in beastComponentFromSQLite.displayDict.keys() ):
@@ -166,28 +205,74 @@ class beastComponentFromSQLite(beastComponent):
             relatedDisplayName = beastComponentFromSQLite.displayDictSTD[system.name]
         displayWithMacro = relatedDisplayName + "   " +  '"pvName=' + self.name + '"'
         relatedDisplay = {"TITLE"           :   "Show voltage channel", 
-                          "DISPLAY_ORDER"   :   "0", 
+                          "DISPLAY_ORDER"   :   0, 
                           "DETAIL"          :   displayWithMacro }
-        self.display.append(relatedDisplay)
+        self.display = ( relatedDisplay, )
         return
 
     def getPVattributes(self):
         '''
         Get the PV attributes for voltage channels from SQLite
         '''
-        pvDescription  = "Voltage alarm for " + self.name.replace( ":alarm", "" ).replace(":", " : ")
-        self.pv = {"DESCR"                  :   pvDescription, 
-                   "ENABLED_IND"            :   1, 
-                   "ANNUNCIATE_IND"         :   'true', 
-                   "LATCH_IND"              :   'true', 
-                   "DELAY"                  :   2, 
-                   "DELAY_COUNT"            :   0, 
-                   "FILTER"                 :   "",
-                   "ACT_GLOBAL_ALARM_IND"   :   0}
+        self.pvDescription = "Voltage alarm for " + self.name.replace( ":alarm", "" ).replace(":", " : ")
         return
 
+    def getPV(self):
+        '''
+        Return the map of the PV attributes made from the description and 
+        the default attributes, None if the component is not a PV
+        '''
+        if( self.pvCustom is not None ):
+            return self.pvCustom
+        if( self.pvDescription is None ):
+            return None
+        # The map is made in one literal so that its key order is always the same
+        pvDefaults = beastComponentFromSQLite.pvDefaults
+        return {"DESCR"                  :   self.pvDescription, 
+                "ENABLED_IND"            :   pvDefaults["ENABLED_IND"], 
+                "ANNUNCIATE_IND"         :   pvDefaults["ANNUNCIATE_IND"], 
+                "LATCH_IND"              :   pvDefaults["LATCH_IND"], 
+                "DELAY"                  :   pvDefaults["DELAY"], 
+                "DELAY_COUNT"            :   pvDefaults["DELAY_COUNT"], 
+                "FILTER"                 :   pvDefaults["FILTER"],
+                "ACT_GLOBAL_ALARM_IND"   :   pvDefaults["ACT_GLOBAL_ALARM_IND"]}
+
+    def setPV(self, pvAttributes):
+        '''
+        Only the description is kept if the other attributes are the defaults, 
+        otherwise the whole map is kept 
+        '''
+        self.invalidateFingerprint()
+        self.pvDescription = None
+        self.pvCustom = None
+        if( pvAttributes is None ):
+            return
+        otherAttributes = dict( pvAttributes )
+        pvDescription = otherAttributes.pop( "DESCR", None )
+        if( otherAttributes == beastComponentFromSQLite.pvDefaults and pvDescription is not None ):
+            self.pvDescription = pvDescription
+        else:
+            self.pvCustom = dict( pvAttributes )
+        return
+
+    pv = property( getPV, setPV )
+
+    def getMainAttributes(self):
+        '''
+        The main attributes of beastComponent, except that the components without PV have
+        no entries. Their guidance is not written into the SQL or XML files for BEAST, so
+        the trees read back from the BEAST DB or from the XML files do not have it either.
+        '''
+        mainAttributes = beastComponent.getMainAttributes( self )
+        if( self.pv is None ):
+            for attribName in ( "guidance", "command", "automatedAction", "display" ):
+                mainAttributes[attribName] = ()
+        return mainAttributes
+
+    mainAttributes = property( getMainAttributes )
+
+
 
-        
     def makeAlarmEntries(self, sqlFile, parBeastID ):
         """ Recursively make entries into the BEAST SQL file """
         
@@ -219,34 +304,22 @@ class beastComponentFromSQLite(beastComponent):
         to the element. Return an XML element corresponding to the 
         current BEST component. 
         '''        
-        
-        ''' 
-        A dictionary for translating the names of the columns in the MySQL PV table and the 
-        tag name in the corresponding "pv" tag in the XML file created from BEAST MySQL DB. 
-        '''             
-        xmlTagName = {"DESCR"               :   "description", 
-                      "ENABLED_IND"         :   "enabled", 
-                      "ANNUNCIATE_IND"      :   "annunciating", 
-                      "LATCH_IND"           :   "latching", 
-                      "DELAY"               :   "delay", 
-                      "DELAY_COUNT"         :   "count", 
-                      "FILTER"              :   "filter"
-        }
+        xmlTagName = beastComponentFromSQLite.xmlTagName
+        pvAttributes = self.pv  # The map is made on each access, so it is read once
         
         if( xmlRoot == None ):
             configElement = lxml.etree.Element( "config", name = "HallD" )
             xmlRoot = configElement
 
         elementName = "component"
-        if( self.pv != None ) :
+        if( pvAttributes != None ) :
             elementName = "pv"
         newElement = lxml.etree.SubElement( xmlRoot, elementName, name = self.name )
         
-        if( self.pv == None ):
+        if( pvAttributes == None ):
             ''' Make elements for children if this tag is not for a PV'''
             for child in self.children :
-                childElememt = child.makeXMLElement( newElement )
-                newElement.append( childElememt )
+                child.makeXMLElement( newElement )
         else:
             ''' if this is a PV then make the tags for PV attributes '''
             ''' Make the Guidance tags '''
@@ -283,15 +356,155 @@ class beastComponentFromSQLite(beastComponent):
                 delayElement.text = act["DELAY"]
             
             
-            for pvAttrib in self.pv.keys():
+            for pvAttrib in pvAttributes.keys():
                 if pvAttrib in xmlTagName :
 #                    print "PV Attribute is ", pvAttrib,  "TagName is ", xmlTagName[pvAttrib]
                     attribElement = lxml.etree.SubElement( newElement, xmlTagName[pvAttrib] )
-                    attribElement.text = str( self.pv[pvAttrib] )
+                    attribElement.text = beastComponentFromSQLite.makeXMLValue( pvAttributes[pvAttrib] )
             
             
                 
         return newElement
+
+
+    def makeXMLText(self, baseLevel=0):
+        '''
+        Return the same XML text as lxml.etree.tostring( self.makeXMLElement(), pretty_print=True ), 
+        but made directly from strings. The PV tags are most of the tree and all have the 
+        same structure, so this is much faster than making the elements. If a name or a 
+        value has other characters than printable ASCII, the text is made by lxml. 
+        The text is indented as if it were baseLevel tags deep in the pretty-printed file.
+        '''
+        xmlPieces = []
+        workList = [ (self, baseLevel, False) ]
+        while( len(workList) > 0 ):
+            (comp, level, closeTag) = workList.pop()
+            indent = "  " * level
+            if( closeTag ):
+                xmlPieces.append( indent + "</component>\n" )
+                continue
+            pvAttributes = comp.pv
+            if( pvAttributes != None ):
+                pvText = comp.makePVText( pvAttributes, indent )
+                if( pvText == None ):
+                    return self.makeXMLTextByLXML( baseLevel )
+                xmlPieces.append( pvText )
+                continue
+            compName = beastComponentFromSQLite.escapeXMLText( comp.name, True )
+            if( compName == None ):
+                return self.makeXMLTextByLXML( baseLevel )
+            if( len(comp.children) == 0 ):
+                xmlPieces.append( indent + '<component name="' + compName + '"/>\n' )
+                continue
+            xmlPieces.append( indent + '<component name="' + compName + '">\n' )
+            workList.append( (comp, level, True) )
+            for child in reversed( comp.children ):
+                workList.append( (child, level + 1, False) )
+        return str( "".join( xmlPieces ) )
+
+    def makeXMLTextByLXML(self, baseLevel):
+        '''
+        Return the XML text of makeXMLText made by lxml. The element is put under baseLevel 
+        enclosing tags, so that lxml indents it, and the lines of those tags are dropped.
+        '''
+        if( baseLevel == 0 ):
+            return lxml.etree.tostring( self.makeXMLElement(), pretty_print=True )
+        xmlRoot = lxml.etree.Element( "config" )
+        xmlParent = xmlRoot
+        for level in xrange( baseLevel - 1 ):
+            xmlParent = lxml.etree.SubElement( xmlParent, "component" )
+        self.makeXMLElement( xmlParent )
+        xmlLines = lxml.etree.tostring( xmlRoot, pretty_print=True ).split( "\n" )
+        return "\n".join( xmlLines[baseLevel:-baseLevel - 1] ) + "\n"
+
+    def makePVText(self, pvAttributes, indent):
+        '''
+        Return the text of the pv tag of this component indented by indent, None if there 
+        is text that has to be written by lxml. The tags are filled into a template that 
+        is made once for each structure of the pv tag, the number of the entries of each 
+        kind and the PV attributes define the structure.
+        '''
+        xmlValues = [ self.name ]
+        pvStructure = [ indent ]
+        for (attribName, entryTag, entryKeys) in beastComponentFromSQLite.xmlEntryTags:
+            entries = getattr( self, attribName )
+            pvStructure.append( len(entries) )
+            for entry in entries:
+                for entryKey in entryKeys:
+                    xmlValues.append( entry[entryKey] )
+        for pvAttrib in pvAttributes.keys():
+            if pvAttrib in beastComponentFromSQLite.xmlTagName :
+                pvStructure.append( pvAttrib )
+                xmlValues.append( pvAttributes[pvAttrib] )
+        # The values are checked and escaped together, joined with a character that cannot be in them
+        try:
+            allText = "\0".join( [ beastComponentFromSQLite.makeXMLValue( value ) for value in xmlValues ] ).encode( "ascii" )
+        except (TypeError, UnicodeError):
+            return None
+        if( len( allText.translate( None, beastComponentFromSQLite.xmlPlainCharacters + "\0" ) ) > 0 or 
+            allText.count( "\0" ) != len(xmlValues) - 1 ):
+            return None
+        if( "&" in allText or "<" in allText or ">" in allText or '"' in allText ):
+            xmlValues = allText.replace( "&", "&amp;" ).replace( "<", "&lt;" ).replace( ">", "&gt;" ).split( "\0" )
+            xmlValues[0] = xmlValues[0].replace( '"', "&quot;" )
+        else:
+            xmlValues = allText.split( "\0" )
+        pvStructure = tuple( pvStructure )
+        pvTemplate = beastComponentFromSQLite.pvTemplates.get( pvStructure )
+        if( pvTemplate == None ):
+            pvTemplate = beastComponentFromSQLite.makePVTemplate( pvStructure )
+        return pvTemplate % tuple( xmlValues )
+
+    @classmethod
+    def makePVTemplate(cls, pvStructure):
+        """ 
+        Make the template of the pv tag with the structure from makePVText, 
+        the same text as lxml writes with %s for the name and the values 
+        """
+        indent = pvStructure[0]
+        entryIndent = indent + "  "
+        valueIndent = entryIndent + "  "
+        templateLines = []
+        for (entryIndex, (attribName, entryTag, entryKeys)) in enumerate( cls.xmlEntryTags ):
+            for entryNumber in xrange( pvStructure[1 + entryIndex] ):
+                templateLines.append( entryIndent + "<" + entryTag + ">\n" )
+                for entryKey in entryKeys:
+                    childTag = cls.xmlEntryChildTags[entryKey]
+                    templateLines.append( valueIndent + "<" + childTag + ">%s</" + childTag + ">\n" )
+                templateLines.append( entryIndent + "</" + entryTag + ">\n" )
+        for pvAttrib in pvStructure[1 + len(cls.xmlEntryTags):]:
+            pvTag = cls.xmlTagName[pvAttrib]
+            templateLines.append( entryIndent + "<" + pvTag + ">%s</" + pvTag + ">\n" )
+        if( len(templateLines) == 0 ):
+            pvTemplate = indent + '<pv name="%s"/>\n'
+        else:
+            pvTemplate = indent + '<pv name="%s">\n' + "".join( templateLines ) + indent + "</pv>\n"
+        cls.pvTemplates[pvStructure] = pvTemplate
+        return pvTemplate
+
+    @classmethod
+    def makeXMLValue(cls, value):
+        """ Return the text of the tag for the value, the strings are kept as they are so that unicode stays unicode """
+        if( isinstance( value, basestring ) ):
+            return value
+        return str( value )
+
+    @classmethod
+    def escapeXMLText(cls, text, inAttribute):
+        """ 
+        Escape the text the same way as lxml does, the quotes only in the attributes. 
+        Returns None if the text is not a string of printable ASCII characters.
+        """
+        try:
+            text = text.encode( "ascii" )
+        except (AttributeError, UnicodeError):
+            return None
+        if( len( text.translate( None, cls.xmlPlainCharacters ) ) > 0 ):
+            return None
+        text = text.replace( "&", "&amp;" ).replace( "<", "&lt;" ).replace( ">", "&gt;" )
+        if( inAttribute ):
+            text = text.replace( '"', "&quot;" )
+        return text
            
             
         
@@ -0,0 +1,147 @@
+'''
+Created on October 18, 2026
+
+This file contains a class to handle the alarm tree hierarchy
+in BEAST read from the XML configuration files, like the ones made
+by convertSQLiteToXML. It inherits from beastComponent base class,
+so the trees can be compared with the trees from the SQLite and
+MySQL databases.
+
+@author: Hovanes Egiyan
+'''
+import lxml.etree
+
+from beastComponent import beastComponent
+
+
+class beastComponentFromXML(beastComponent):
+    '''
+    Class to handle a node in the alarm tree hierarchy in BEAST read from an XML file
+    '''
+    __slots__ = ()
+
+    # Tags of the components in the XML file
+    componentTags = ("config", "component", "pv")
+
+    # Entries of the pv tags: tag, attribute of the component, order key and the keys of the tags inside
+    entryTags = {"guidance"         :   ("guidance",        "GUIDANCE_ORDER",       (("title", "TITLE"), ("details", "DETAIL"))),
+                 "display"          :   ("display",         "DISPLAY_ORDER",        (("title", "TITLE"), ("details", "DETAIL"))),
+                 "command"          :   ("command",         "COMMAND_ORDER",        (("title", "TITLE"), ("details", "DETAIL"))),
+                 "automated_action" :   ("automatedAction", "AUTO_ACTION_ORDER",    (("title", "TITLE"), ("details", "DETAIL"), ("delay", "DELAY")))}
+
+    # PV attribute tags and the columns of the PV table they correspond to
+    pvColumns = {"description"  :   "DESCR",
+                 "enabled"      :   "ENABLED_IND",
+                 "annunciating" :   "ANNUNCIATE_IND",
+                 "latching"     :   "LATCH_IND",
+                 "delay"        :   "DELAY",
+                 "count"        :   "DELAY_COUNT",
+                 "filter"       :   "FILTER"}
+
+    # PV columns that are not written into the XML files, with the values used by the converter
+    pvDefaults = {"ACT_GLOBAL_ALARM_IND"   :   0}
+
+    @classmethod
+    def copyComponent(cls, component, parent ):
+        """
+        Create a copy of a the component with the same name, but use
+        a different parent in general. Returns the instance of the
+        newly created component
+        """
+        newComp = beastComponentFromXML( component.name, parent )
+        newComp.guidance        = component.guidance
+        newComp.command         = component.command
+        newComp.automatedAction = component.automatedAction
+        newComp.display         = component.display
+        newComp.pv              = component.pv
+        for child in component.children:
+            newChild = beastComponentFromXML.copyComponent(child, newComp)
+            newComp.addChild(newChild)
+        return newComp
+
+    @classmethod
+    def loadFile(cls, xmlFile):
+        """
+        Read the XML file (a file name or a file object) and return the component made
+        from its top tag, with the tree of the components below it. The file is parsed
+        as a stream and each tag is cleared after it was used, so the memory is taken
+        by the component tree only and not by the XML document.
+        """
+        root = None
+        compStack = []      # Components of the open component tags
+        entryDepth = 0      # Depth of the open tags inside the innermost component tag
+        for (event, element) in lxml.etree.iterparse( xmlFile, events=("start", "end") ):
+            if( event == "start" ):
+                if( element.tag in cls.componentTags and entryDepth == 0 ):
+                    parent = None
+                    if( len(compStack) > 0 ):
+                        parent = compStack[-1]
+                    comp = cls( element.get( "name" ), parent )
+                    if( parent is None ):
+                        root = comp
+                    else:
+                        parent.addChild( comp )
+                    if( element.tag == "pv" ):
+                        comp.pv = dict( cls.pvDefaults )
+                    compStack.append( comp )
+                else:
+                    entryDepth += 1
+                continue
+            # The tags are used when they end, after that they are not needed any more
+            if( entryDepth > 0 ):
+                entryDepth -= 1
+                if( entryDepth == 0 ):
+                    compStack[-1].addXMLEntry( element )
+                    cls.dropElement( element )
+                continue
+            compStack.pop()
+            cls.dropElement( element )
+        if( root is None ):
+            errMsg = "No alarm components in the XML file {0}".format( xmlFile )
+            print errMsg
+            raise Exception( errMsg )
+        return root
+
+    @classmethod
+    def dropElement(cls, element):
+        """ Clear the element and remove the elements before it, which were already used """
+        element.clear()
+        while( element.getprevious() is not None ):
+            del element.getparent()[0]
+        return
+
+    @classmethod
+    def convertValue(cls, text):
+        """ Convert the text of a tag to the value the DB would give, numbers become integers """
+        if( text is None ):
+            return ""
+        if( text.isdigit() or ( text.startswith( "-" ) and text[1:].isdigit() ) ):
+            return int( text )
+        return text
+
+
+    def __init__(self, compName=None, parent=None):
+        '''
+        Constructor for the class. The components are made by loadFile,
+        which also fills their attributes and children.
+        '''
+        beastComponent.__init__(self, None, parent)
+        self.name = compName
+        return
+
+    def addXMLEntry(self, element):
+        """ Add the entry or the PV attribute from the tag directly inside the component or pv tag """
+        if( element.tag in beastComponentFromXML.entryTags ):
+            (attribName, orderKey, entryKeys) = beastComponentFromXML.entryTags[element.tag]
+            entries = list( getattr( self, attribName ) )
+            entry = {orderKey : len(entries)}
+            for (childTag, entryKey) in entryKeys:
+                entry[entryKey] = element.findtext( childTag )
+            entries.append( entry )
+            setattr( self, attribName, entries )
+        elif( element.tag in beastComponentFromXML.pvColumns and self.pv is not None ):
+            self.pv[beastComponentFromXML.pvColumns[element.tag]] = beastComponentFromXML.convertValue( element.text )
+            self.invalidateFingerprint()
+        return
+
+# End of "beastComponentFromXML" class definition
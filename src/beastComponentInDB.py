@@ -12,6 +12,7 @@ database for the BEAST alarm system.
 import copy
 
 from beastComponent import beastComponent
+from beastDBCache import beastDBCache
 from namedAlarmComponent import namedAlarmComponent
 
 
@@ -19,6 +20,7 @@ class beastComponentInDB(beastComponent):
     '''
     Class to handle a node in the alarm tree hierarchy in BEAST with an access to DB 
     '''
+    __slots__ = ("curs", "level", "dbCache", "lazy")
    
     @classmethod
     def copyComponent(cls, component, parent ):
@@ -27,26 +29,67 @@ class beastComponentInDB(beastComponent):
         a different parent in general. Returns the instance of the 
         newly created component
         """
-        newComp = beastComponentInDB( component.curs, component.component_id, parent )
+        # The level follows the new parent, the area/detector/system lookups depend on it
+        level = 0
+        if( parent is not None ):
+            level = parent.level + 1
+        newComp = beastComponentInDB( component.curs, component.component_id, parent, level, False, component.dbCache )
         for child in component.children:
             newChild = beastComponentInDB.copyComponent(child, newComp)
-            newComp.children.append(newChild)
+            newComp.addChild(newChild)
         return newComp
    
    
    
-    def __init__(self, inCursor=None, compID=None, parent=None, lvl=0 ):
+    @classmethod
+    def loadTree(cls, inCursor, compID, chunkSize=1000, placeholder="%s"):
+        """
+        Build the tree for the component compID reading each BEAST table only once 
+        (the attribute tables in IN lists of chunkSize IDs) instead of querying 
+        the tables for each node. Returns the root of the tree.
+        """
+        dbCache = beastDBCache( inCursor, chunkSize, placeholder )
+        dbCache.loadTree( compID )
+        return cls( inCursor, compID, None, 0, True, dbCache )
+   
+   
+    @classmethod
+    def loadTreeWithPool(cls, pool, compID, maxQueries=4, chunkSize=1000, placeholder="%s"):
+        """
+        Same as loadTree, but the queries of the attribute tables are run at the same time 
+        in up to maxQueries threads with the cursors from the connectionPool, to hide the 
+        latency of the DB server. The components of the tree have no cursor.
+        """
+        dbCache = beastDBCache( None, chunkSize, placeholder )
+        dbCache.loadTreeWithPool( compID, pool, maxQueries )
+        return cls( None, compID, None, 0, True, dbCache )
+   
+   
+    def __init__(self, inCursor=None, compID=None, parent=None, lvl=0, buildTree=True, dbCache=None, lazy=False ):
         beastComponent.__init__(self, compID, parent)
         '''
-        Constructor for the class. Creates the object, then to create objects for the children.
-        That function will call the constructor for children, so the process will go recursively. 
+        Constructor for the class. Creates the object, then builds the tree of its children 
+        unless buildTree is False. If dbCache is given the rows are taken from it 
+        instead of querying the DB. With lazy the children are only read the first time they 
+        are asked for, all children of a component are read together with their attributes.
         '''        
         self.curs       = inCursor  # cursor for the DB connector 
         self.level      = lvl       # Level # in the hierarchy
+        self.dbCache    = dbCache   # Rows of the BEAST tables loaded in bulk
+        self.lazy       = lazy      # The children are loaded on the first access
+        
+        if( lazy and self.dbCache == None ):
+            self.dbCache = beastDBCache( inCursor )
+            self.dbCache.loadComponent( compID )
         
         # Find the fields for this component to assign the data members
-        self.curs.execute( "SELECT * FROM ALARM_TREE WHERE COMPONENT_ID=%s", (compID,) )
-        allComponents = self.curs.fetchall()
+        if( self.dbCache != None ):
+            allComponents = [ self.dbCache.getComponentRow( compID ) ]
+            if( allComponents[0] == None ):
+                allComponents = []
+        else:
+            self.curs.execute( "SELECT * FROM ALARM_TREE WHERE COMPONENT_ID=%s", (compID,) )
+            allComponents = self.curs.fetchall()
         
         # Raise an exception if there are too many rows from the previous SQL 
         # There has to be only one entry in the table for each unique id
@@ -81,41 +124,34 @@ class beastComponentInDB(beastComponent):
         self.getPVattributes() 
 #        self.convertNoneToNULL()
         # Keep going to find the children
-        self.children   = self.findChildren()
+        if( lazy ):
+            self.setPendingChildren()
+        elif( buildTree ):
+            self.buildSubtree()
 #        print "Finished creating component ", self.getFullPath("/")
 
     
     def getArea(self):
         """
         Find the alarm area above this subsystem in the tree.
+        The result is cached in the nodes.
         """
-        if( self.level == 0 ):
-            return self
-        else:
-            return self.parentSys.getArea()
+        return self.findCachedAncestor( "area", lambda comp: comp.level == 0 )
         
     
     def getDetector(self):
         """
         Find the detector above this subsystem in the tree.
+        The result is cached in the nodes.
         """
-        if( self.level == 1 ):
-            return self
-        else:
-            if( self.parentSys == None ):
-                return None
-            return self.parentSys.getDetector()
+        return self.findCachedAncestor( "detector", lambda comp: comp.level == 1 )
 
     def getSystem(self):
         """
         Find the alarm area above this subsystem in the tree.
+        The result is cached in the nodes.
         """
-        if( self.level == 2 ):
-            return self
-        else:
-            if( self.parentSys == None ):
-                return None
-            return self.parentSys.getSystem()
+        return self.findCachedAncestor( "system", lambda comp: comp.level == 2 )
   
         
 #     def getAlarmPVName(self):
@@ -128,39 +164,51 @@ class beastComponentInDB(beastComponent):
 #         return pvName
         
     def getAutomatedActions(self):
-        self.automatedAction = []
+        if( self.dbCache != None ):
+            self.automatedAction = self.dbCache.getAttributeRows( "AUTOMATED_ACTION", self.component_id )
+            return
         sql  = "SELECT TITLE, AUTO_ACTION_ORDER, DETAIL, DELAY FROM AUTOMATED_ACTION WHERE COMPONENT_ID = %s"
         self.curs.execute( sql, (self.component_id,) )
         allActions = self.curs.fetchall()
-        for action in allActions:
-            self.automatedAction.append( copy.deepcopy(action))
+        # The components without rows keep the shared empty tuple
+        if( len(allActions) > 0 ):
+            self.automatedAction = [ copy.deepcopy(action) for action in allActions ]
         return
        
     def getCommands(self):
-        self.command = []
+        if( self.dbCache != None ):
+            self.command = self.dbCache.getAttributeRows( "COMMAND", self.component_id )
+            return
         sql  = "SELECT TITLE, COMMAND_ORDER, DETAIL FROM COMMAND WHERE COMMAND.COMPONENT_ID = %s"
         self.curs.execute( sql, (self.component_id,) )
         allCommands = self.curs.fetchall()
-        for comd in allCommands:
-            self.command.append( copy.deepcopy(comd) )
+        # The components without rows keep the shared empty tuple
+        if( len(allCommands) > 0 ):
+            self.command = [ copy.deepcopy(comd) for comd in allCommands ]
         return
 
     def getDisplays(self):
-        self.display = []
+        if( self.dbCache != None ):
+            self.display = self.dbCache.getAttributeRows( "DISPLAY", self.component_id )
+            return
         sql  = "SELECT TITLE, DISPLAY_ORDER, DETAIL FROM DISPLAY WHERE COMPONENT_ID = %s"
         self.curs.execute( sql, (self.component_id,) )
         allDisplays = self.curs.fetchall()
-        for disp in allDisplays:
-            self.display.append( copy.deepcopy(disp) )
+        # The components without rows keep the shared empty tuple
+        if( len(allDisplays) > 0 ):
+            self.display = [ copy.deepcopy(disp) for disp in allDisplays ]
         return
       
     def getGuidances(self):
-        self.guidance = []
+        if( self.dbCache != None ):
+            self.guidance = self.dbCache.getAttributeRows( "GUIDANCE", self.component_id )
+            return
         sql  = "SELECT TITLE, GUIDANCE_ORDER, DETAIL FROM GUIDANCE WHERE COMPONENT_ID = %s"
         self.curs.execute( sql, (self.component_id,) )
         allGuidances = self.curs.fetchall()
-        for guid in allGuidances:
-            self.guidance.append( copy.deepcopy(guid) )
+        # The components without rows keep the shared empty tuple
+        if( len(allGuidances) > 0 ):
+            self.guidance = [ copy.deepcopy(guid) for guid in allGuidances ]
         return
         
         
@@ -170,6 +218,11 @@ class beastComponentInDB(beastComponent):
         Only try to find one single entry in the PV table that matches self.component_id
         '''
         self.pv = {}
+        if( self.dbCache != None ):
+            pvRows = self.dbCache.getAttributeRows( "PV", self.component_id )
+            if( len( pvRows ) > 0 ):
+                self.pv = pvRows[0]
+            return
         sql  = "SELECT DESCR, ENABLED_IND, ANNUNCIATE_IND, LATCH_IND, DELAY, FILTER, DELAY_COUNT, ACT_GLOBAL_ALARM_IND FROM PV WHERE COMPONENT_ID = %s"
         self.curs.execute( sql, (self.component_id,) )
         firstPV = self.curs.fetchone()
@@ -192,22 +245,28 @@ class beastComponentInDB(beastComponent):
 #         return
                                
     def findChildren(self):
-        """Finds children of this component. Note that this function will create other 
-        objects of this class which will in turn call this function. The recursive process 
-        continues until we reach an object with no children found and the functions start returning"""
+        """Finds children of this component and builds the whole tree below it. 
+        The tree is built with a worklist, so there is no recursion and 
+        cycles in the PARENT_CMPNT_ID column are reported with an exception"""
+        return self.buildSubtree()
+
+    def findChildItems(self):
+        if( self.lazy ):
+            return self.dbCache.loadChildren( self.component_id )
+        if( self.dbCache != None ):
+            return self.dbCache.getChildRows( self.component_id )
         # Search for all the raws in the component_hierarchy with the parent_id column matching 
         # the self.parent_id of this object
         self.curs.execute( "SELECT * FROM ALARM_TREE WHERE PARENT_CMPNT_ID=%s", (self.component_id,) )
         childRows = self.curs.fetchall()
 #        print "Found {0} children for parent with COMPONENT_ID {1}".format( len(childRows), self.component_id )
+        return childRows
+
+    def makeChild(self, childRow):
+        return beastComponentInDB( self.curs, childRow["COMPONENT_ID"], self, self.level+1, False, self.dbCache, self.lazy )
 
-        # Create objects for the children
-        childList = []        
-        for child in childRows:
-            childID = child["COMPONENT_ID"]
-            newSubsystem = beastComponentInDB( self.curs, childID, self, self.level+1 ) 
-            childList.append(newSubsystem)
-        return childList
+    def getTreeKey(self):
+        return self.component_id
 
         
     def makeAlarmEntries(self, sqlFile, parBeastID = None ):
@@ -0,0 +1,187 @@
+'''
+Created on October 18, 2026
+
+This file contains a class that reads the BEAST alarm configuration
+tables in bulk and keeps the rows grouped by COMPONENT_ID, so that
+the beastComponentInDB tree can be built without per-node queries.
+
+@author: Hovanes Egiyan
+'''
+from multiprocessing.pool import ThreadPool
+
+
+class beastDBCache(object):
+    '''
+    Class to hold the rows of the BEAST MySQL tables for one alarm tree
+    '''
+
+    # Columns selected from the attribute tables, the same as for the per-node queries
+    attributeColumns = {"AUTOMATED_ACTION"  :   ("TITLE", "AUTO_ACTION_ORDER", "DETAIL", "DELAY"),
+                        "COMMAND"           :   ("TITLE", "COMMAND_ORDER", "DETAIL"),
+                        "DISPLAY"           :   ("TITLE", "DISPLAY_ORDER", "DETAIL"),
+                        "GUIDANCE"          :   ("TITLE", "GUIDANCE_ORDER", "DETAIL"),
+                        "PV"                :   ("DESCR", "ENABLED_IND", "ANNUNCIATE_IND", "LATCH_IND",
+                                                 "DELAY", "FILTER", "DELAY_COUNT", "ACT_GLOBAL_ALARM_IND")}
+
+    def __init__(self, inCursor=None, chunkSize=1000, placeholder="%s"):
+        '''
+        Constructor. The IDs are put into the IN (...) lists in chunks of chunkSize,
+        placeholder is the parameter marker of the DB module ("%s" for MySQLdb, "?" for sqlite3).
+        '''
+        self.curs           = inCursor      # cursor for the DB connector
+        self.chunkSize      = chunkSize     # Number of IDs in one IN (...) list
+        self.placeholder    = placeholder   # Parameter marker for the queries
+        self.componentRows  = {}            # ALARM_TREE rows by COMPONENT_ID
+        self.childRows      = {}            # ALARM_TREE rows by PARENT_CMPNT_ID
+        self.attributeRows  = {}            # For each attribute table the lists of rows by COMPONENT_ID
+        self.treeLoaded     = False         # True after the whole ALARM_TREE table was read
+        self.loadedParents  = set()         # COMPONENT_IDs whose children were read by loadChildren
+        for tableName in beastDBCache.attributeColumns.keys():
+            self.attributeRows[tableName] = {}
+        return
+
+
+    def loadTree(self, rootID):
+        """
+        Read the ALARM_TREE table in one query, then read the attribute tables
+        for all components under rootID in chunks. Returns the list of the
+        COMPONENT_IDs in the tree.
+        """
+        self.curs.execute( "SELECT * FROM ALARM_TREE" )
+        self.addComponentRows( self.curs.fetchall() )
+        self.treeLoaded = True
+        treeIDs = self.getSubtreeIDs( rootID )
+        self.loadAttributes( treeIDs )
+        return treeIDs
+
+    def loadTreeWithPool(self, rootID, pool, maxQueries=4):
+        """
+        Same as loadTree, but the queries of the attribute tables are run at the same 
+        time in up to maxQueries threads, each with a cursor borrowed from the connectionPool. 
+        The rows are grouped in this thread as the results arrive. Returns the list of 
+        the COMPONENT_IDs in the tree.
+        """
+        curs = pool.borrowCursor()
+        try:
+            curs.execute( "SELECT * FROM ALARM_TREE" )
+            self.addComponentRows( curs.fetchall() )
+        finally:
+            pool.returnCursor( curs )
+        self.treeLoaded = True
+        treeIDs = self.getSubtreeIDs( rootID )
+        queryThreads = ThreadPool( maxQueries )
+        try:
+            attributeQueries = self.makeAttributeQueries( treeIDs )
+            for (tableName, tableRows) in queryThreads.imap_unordered( lambda query: self.runAttributeQuery( pool, query ), attributeQueries ):
+                self.addAttributeRows( tableName, tableRows )
+        finally:
+            queryThreads.close()
+            queryThreads.join()
+        return treeIDs
+
+    def runAttributeQuery(self, pool, attributeQuery):
+        """ Run one (table name, SQL, parameters) query with a borrowed cursor and return (table name, rows) """
+        (tableName, sql, parameters) = attributeQuery
+        curs = pool.borrowCursor()
+        try:
+            curs.execute( sql, parameters )
+            return (tableName, curs.fetchall())
+        finally:
+            pool.returnCursor( curs )
+
+    def loadComponent(self, compID):
+        """ Read the ALARM_TREE row and the attributes of one component, for the trees loaded level by level """
+        if( compID in self.componentRows ):
+            return self.componentRows[compID]
+        self.curs.execute( "SELECT * FROM ALARM_TREE WHERE COMPONENT_ID={0}".format( self.placeholder ), (compID,) )
+        for row in self.curs.fetchall():
+            self.componentRows[row["COMPONENT_ID"]] = row
+        self.loadAttributes( [ compID ] )
+        return self.getComponentRow( compID )
+
+    def loadChildren(self, compID):
+        """
+        Read the ALARM_TREE rows of the children of the component and the attributes 
+        of all the children with one query per table. Returns the rows of the children.
+        """
+        if( self.treeLoaded or compID in self.loadedParents ):
+            return self.getChildRows( compID )
+        self.loadedParents.add( compID )
+        self.curs.execute( "SELECT * FROM ALARM_TREE WHERE PARENT_CMPNT_ID={0}".format( self.placeholder ), (compID,) )
+        childRows = self.curs.fetchall()
+        self.addComponentRows( childRows )
+        self.loadAttributes( [ row["COMPONENT_ID"] for row in childRows ] )
+        return self.getChildRows( compID )
+
+    def addComponentRows(self, componentRows):
+        """ Index the ALARM_TREE rows by their COMPONENT_ID and PARENT_CMPNT_ID """
+        for row in componentRows:
+            self.componentRows[row["COMPONENT_ID"]] = row
+            self.childRows.setdefault( row["PARENT_CMPNT_ID"], [] ).append( row )
+        return
+
+    def getSubtreeIDs(self, rootID):
+        """ Return the COMPONENT_IDs of the component rootID and all components below it """
+        treeIDs = []
+        workList = [ rootID ]
+        visited = set()
+        while( len(workList) > 0 ):
+            compID = workList.pop()
+            if( compID in visited ):
+                continue
+            visited.add( compID )
+            treeIDs.append( compID )
+            for row in self.childRows.get( compID, [] ):
+                workList.append( row["COMPONENT_ID"] )
+        return treeIDs
+
+    def loadAttributes(self, componentIDs):
+        """
+        Read the rows of all attribute tables for the components in chunks
+        and group them by COMPONENT_ID
+        """
+        for (tableName, sql, parameters) in self.makeAttributeQueries( componentIDs ):
+            self.curs.execute( sql, parameters )
+            self.addAttributeRows( tableName, self.curs.fetchall() )
+        return
+
+    def makeAttributeQueries(self, componentIDs):
+        """ Return the list of (table name, SQL, parameters) queries for the attributes of the components """
+        attributeQueries = []
+        for tableName in beastDBCache.attributeColumns.keys():
+            for firstIndex in range( 0, len(componentIDs), self.chunkSize ):
+                idChunk = componentIDs[firstIndex:firstIndex+self.chunkSize]
+                attributeQueries.append( (tableName, self.makeAttributeQuery( tableName, len(idChunk) ), tuple(idChunk)) )
+        return attributeQueries
+
+    def makeAttributeQuery(self, tableName, nIDs):
+        """ Return the SQL to select the rows of the table for nIDs components """
+        columnList = ", ".join( ("COMPONENT_ID",) + beastDBCache.attributeColumns[tableName] )
+        idList = ", ".join( [self.placeholder] * nIDs )
+        return "SELECT {0} FROM {1} WHERE COMPONENT_ID IN ({2})".format( columnList, tableName, idList )
+
+    def addAttributeRows(self, tableName, tableRows):
+        """
+        Group the rows of the table by COMPONENT_ID. Only the columns of the per-node
+        queries are kept, so the rows look the same as if they were read one node at a time.
+        """
+        tableColumns = beastDBCache.attributeColumns[tableName]
+        groupedRows = self.attributeRows[tableName]
+        for row in tableRows:
+            groupedRows.setdefault( row["COMPONENT_ID"], [] ).append( dict( [(col, row[col]) for col in tableColumns] ) )
+        return
+
+
+    def getComponentRow(self, compID):
+        """ Return the ALARM_TREE row of the component, None if it is not known """
+        return self.componentRows.get( compID, None )
+
+    def getChildRows(self, compID):
+        """ Return the ALARM_TREE rows of the children of the component """
+        return self.childRows.get( compID, [] )
+
+    def getAttributeRows(self, tableName, compID):
+        """ Return the list of rows of the attribute table for the component, an empty tuple if there are none """
+        return self.attributeRows[tableName].get( compID, () )
+
+# End of "beastDBCache" class definition
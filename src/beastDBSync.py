@@ -0,0 +1,162 @@
+'''
+Created on October 18, 2026
+
+This file contains a class that writes the alarm trees made from the
+SQLite DB straight into a BEAST database. The trees are compared with
+the ones in the BEAST DB and only the differences are written, in one
+transaction with executemany batches. The BEAST DB can be a MySQL
+server or an SQLite file with the same tables.
+
+@author: Hovanes Egiyan
+'''
+import sys, getpass
+import sqlite3 as lite
+import time
+from optparse import OptionParser
+
+from beastComponentFromSQLite import beastComponentFromSQLite
+from beastComponentInDB import beastComponentInDB
+from beastDeltaFile import beastDeltaFile
+from componentIDAllocator import componentIDAllocator
+from sqliteDB import sqliteDB
+
+
+class beastDBSync(object):
+    '''
+    Sync engine for the BEAST DB on the connection. The rows are written in batches
+    of chunkSize rows and everything is committed at the end, or rolled back on errors.
+    '''
+
+    @classmethod
+    def forSQLite(cls, dbFileName, chunkSize=1000):
+        """ Return the sync engine for an SQLite file with the BEAST tables """
+        con = lite.connect( dbFileName )
+        con.row_factory = lite.Row
+        return cls( con, con.cursor(), "?", chunkSize )
+
+    @classmethod
+    def forMySQL(cls, chunkSize=1000, **connectArgs):
+        """ Return the sync engine for the BEAST MySQL DB opened with connectArgs (host, user, passwd, db...) """
+        try:
+            import MySQLdb
+            import MySQLdb.cursors
+        except ImportError as importError:
+            errMsg = "Cannot connect to the BEAST MySQL DB: {0}".format( importError )
+            print errMsg
+            raise Exception( errMsg )
+        con = MySQLdb.connect( **connectArgs )
+        return cls( con, con.cursor( MySQLdb.cursors.DictCursor ), "%s", chunkSize )
+
+    @classmethod
+    def makeTrees(cls, sqlObject):
+        """ Return the list of beastComponentFromSQLite trees for the detectors in the sqliteDB object """
+        detMap = sqlObject.loadHierarchy()
+        return [ beastComponentFromSQLite( detMap[detName], None, None, True, componentIDAllocator() ) for detName in detMap.keys() ]
+
+
+    def __init__(self, connection, cursor, placeholder="%s", chunkSize=1000):
+        '''
+        Constructor. The cursor has to give the rows as maps with the column names as keys,
+        placeholder is the parameter marker of the DB module ("%s" for MySQLdb, "?" for sqlite3).
+        '''
+        self.con            = connection    # Connection to the BEAST DB
+        self.curs           = cursor        # Cursor on the connection
+        self.placeholder    = placeholder   # Parameter marker for the statements
+        self.chunkSize      = chunkSize     # Number of rows in one executemany call
+        return
+
+
+    def findAreaID(self, areaName):
+        """ Return the COMPONENT_ID of the top component with the name, None if there is no such component """
+        self.curs.execute( "SELECT COMPONENT_ID FROM ALARM_TREE WHERE PARENT_CMPNT_ID IS NULL AND NAME = {0}".format( self.placeholder ), (areaName,) )
+        areaRow = self.curs.fetchone()
+        if( areaRow is None ):
+            return None
+        return areaRow["COMPONENT_ID"]
+
+    def getNextComponentID(self):
+        """ Return the COMPONENT_ID after the largest one in the ALARM_TREE table """
+        self.curs.execute( "SELECT MAX(COMPONENT_ID) AS MAX_ID FROM ALARM_TREE" )
+        maxID = self.curs.fetchone()["MAX_ID"]
+        if( maxID is None ):
+            return 1
+        return maxID + 1
+
+    def makeDelta(self, areaName, newTrees, configTime=None):
+        """
+        Compare the trees under the area component in the BEAST DB with newTrees and return
+        the beastDeltaFile with the changes. The area is created if it is not in the DB yet,
+        the trees under it that are not in newTrees are removed.
+        """
+        delta = beastDeltaFile( componentIDAllocator( self.getNextComponentID() ), configTime, idsPerStatement=self.chunkSize )
+        areaID = self.findAreaID( areaName )
+        areaTree = None
+        if( areaID is None ):
+            areaID = delta.makeAlarmEntry( None, areaName )
+        else:
+            areaTree = beastComponentInDB.loadTree( self.curs, areaID, self.chunkSize, self.placeholder )
+        newNames = set()
+        for newTree in newTrees:
+            newNames.add( newTree.name )
+            dbTree = None
+            if( areaTree is not None ):
+                dbTree = areaTree.getChild( newTree.name )
+            delta.addDiff( dbTree, newTree, areaID )
+        if( areaTree is not None ):
+            for dbTree in areaTree.children:
+                if( dbTree.name not in newNames ):
+                    delta.removeSubtree( dbTree )
+        return delta
+
+    def applyDelta(self, delta):
+        """ Execute the changes of the delta in batches of chunkSize rows and commit them all at once """
+        try:
+            for (statement, paramRows) in delta.makeBatches( self.placeholder ):
+                for first in xrange( 0, len(paramRows), self.chunkSize ):
+                    self.curs.executemany( statement, paramRows[first:first + self.chunkSize] )
+            self.con.commit()
+        except Exception as dbError:
+            self.con.rollback()
+            errMsg = "Could not update the BEAST DB, nothing was changed: {0}".format( dbError )
+            print errMsg
+            raise Exception( errMsg )
+        return
+
+    def syncTrees(self, areaName, newTrees, configTime=None):
+        """ Bring the trees under the area in the BEAST DB up to date with newTrees, return the applied delta """
+        delta = self.makeDelta( areaName, newTrees, configTime )
+        self.applyDelta( delta )
+        return delta
+
+# End of "beastDBSync" class definition
+
+
+
+if __name__ == '__main__':
+    parser = OptionParser( usage = "usage: %prog -s SQLiteFile [-b BEASTFile | -H host -u user -d db] [options]" )
+    parser.add_option( "-s", "--sqlite", dest="SQLiteFile", help="SQLite file with the detector hierarchy" )
+    parser.add_option( "-b", "--beast-file", dest="BEASTFile", help="SQLite file with the BEAST tables instead of the MySQL DB" )
+    parser.add_option( "-H", "--host", dest="Host", help="Host of the BEAST MySQL DB" )
+    parser.add_option( "-u", "--user", dest="User", help="User for the BEAST MySQL DB" )
+    parser.add_option( "-d", "--db", dest="DB", help="Name of the BEAST MySQL DB" )
+    parser.add_option( "-a", "--area", dest="Area", default="HallD", help="Name of the top component in BEAST [%default]" )
+    parser.add_option( "-c", "--chunk-size", dest="ChunkSize", type="int", default=1000, help="Rows in one batch [%default]" )
+    parser.add_option( "-n", "--dry-run", dest="DryRun", action="store_true", default=False, help="Print the changes as SQL without writing them" )
+    (progOpts, progArgs) = parser.parse_args()
+    if( progOpts.SQLiteFile is None or ( progOpts.BEASTFile is None and None in ( progOpts.Host, progOpts.User, progOpts.DB ) ) ):
+        parser.print_help()
+        sys.exit(-1)
+
+    if( progOpts.BEASTFile is not None ):
+        syncEngine = beastDBSync.forSQLite( progOpts.BEASTFile, progOpts.ChunkSize )
+    else:
+        syncEngine = beastDBSync.forMySQL( progOpts.ChunkSize, host=progOpts.Host, user=progOpts.User, db=progOpts.DB,
+                                           passwd=getpass.getpass( "Password for {0}@{1}: ".format( progOpts.User, progOpts.Host ) ) )
+    newTrees = beastDBSync.makeTrees( sqliteDB.openForReading( progOpts.SQLiteFile ) )
+    startTime = time.time()
+    if( progOpts.DryRun ):
+        beastDelta = syncEngine.makeDelta( progOpts.Area, newTrees )
+        beastDelta.write( sys.stdout )
+    else:
+        beastDelta = syncEngine.syncTrees( progOpts.Area, newTrees )
+    print "{0} in {1:.1f} s".format( beastDelta.getSummary(), time.time() - startTime )
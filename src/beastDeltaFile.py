@@ -0,0 +1,191 @@
+'''
+Created on October 18, 2026
+
+This file contains a class that makes the SQL script to bring an alarm
+tree in the BEAST MySQL database up to date with a new tree, for example
+one made from the SQLite DB. Only the components that differ between
+the trees are touched, the others keep their rows and COMPONENT_IDs.
+
+@author: Hovanes Egiyan
+'''
+from beastSQLFile import beastSQLFile
+from componentDiff import componentDiff
+
+
+class beastDeltaFile(beastSQLFile):
+    '''
+    Collector of the DELETEs, UPDATEs and INSERTs that change the tree in the BEAST DB
+    into the new tree. The script deletes the rows first, then updates the modified rows
+    and inserts the new ones last, all of it in one transaction.
+    '''
+
+    # BEAST tables with the entries of the components, by the name of the attribute
+    entryTables = {"guidance"           :   "GUIDANCE",
+                   "display"            :   "DISPLAY",
+                   "command"            :   "COMMAND",
+                   "automatedAction"    :   "AUTOMATED_ACTION"}
+
+    @classmethod
+    def fromTrees(cls, dbTree, newTree, idAllocator, configTime=None):
+        """
+        Return the delta that changes dbTree (a beastComponentInDB tree) into newTree.
+        The new components get their COMPONENT_IDs from idAllocator, which has to start
+        above the IDs that are in use in the BEAST DB.
+        """
+        delta = cls( idAllocator, configTime )
+        delta.addDiff( dbTree, newTree )
+        return delta
+
+
+    def __init__(self, idAllocator=None, configTime=None, rowsPerInsert=1000, idsPerStatement=1000):
+        '''
+        Constructor. The IN (...) lists of the DELETEs and UPDATEs have at most idsPerStatement IDs,
+        the other arguments are the same as for beastSQLFile.
+        '''
+        beastSQLFile.__init__(self, idAllocator, configTime, rowsPerInsert)
+        self.idsPerStatement    = idsPerStatement   # Largest number of IDs in one IN (...) list
+        self.deletedIDs         = {}                # COMPONENT_IDs whose rows are deleted, by table name
+        self.removedLevels      = []                # COMPONENT_IDs of the deleted ALARM_TREE rows by their depth in the removed subtrees
+        self.pvUpdates          = []                # (COMPONENT_ID, list of (column, new value)) for the changed PV rows
+        self.modifiedIDs        = []                # COMPONENT_IDs of the modified components, their CONFIG_TIME is updated
+        for (tableName, columns) in beastSQLFile.tableColumns[1:]:
+            self.deletedIDs[tableName] = []
+        return
+
+
+    def addDiff(self, dbTree, newTree, parentID=None):
+        """
+        Add the changes that turn dbTree into newTree. The components are compared by their main
+        attributes. parentID is the COMPONENT_ID for newTree if it is new itself (if dbTree is None
+        or has another name), by default dbTree stays under the same parent.
+        """
+        if( dbTree is not None and parentID is None ):
+            parentID = dbTree.parent_cmpnt_id
+        treeDiff = componentDiff( dbTree, newTree, False, True )
+        for oldComp in treeDiff.removed.values():
+            self.removeSubtree( oldComp )
+        for (oldComp, newComp, changedAttributes) in treeDiff.modified.values():
+            self.updateComponent( oldComp, newComp, changedAttributes )
+        for newComp in treeDiff.added.values():
+            if( newComp is newTree ):
+                newComp.makeAlarmEntries( self, parentID )
+            else:
+                newComp.makeAlarmEntries( self, self.findMatchingComponent( dbTree, newTree, newComp.parentSys ).component_id )
+        return
+
+    def findMatchingComponent(self, dbTree, newTree, newComp):
+        """ Return the component of dbTree at the same place as newComp is in newTree """
+        compNames = []
+        while( newComp is not newTree ):
+            compNames.append( newComp.name )
+            newComp = newComp.parentSys
+        oldComp = dbTree
+        for compName in reversed( compNames ):
+            oldComp = oldComp.getChild( compName )
+        return oldComp
+
+    def removeSubtree(self, oldComp):
+        """ Delete the rows of the component and of all components below it """
+        workList = [ (oldComp, 0) ]
+        while( len(workList) > 0 ):
+            (comp, depth) = workList.pop()
+            if( depth == len(self.removedLevels) ):
+                self.removedLevels.append( [] )
+            self.removedLevels[depth].append( comp.component_id )
+            for tableName in self.deletedIDs.keys():
+                self.deletedIDs[tableName].append( comp.component_id )
+            workList.extend( [ (child, depth + 1) for child in comp.children ] )
+        return
+
+    def updateComponent(self, oldComp, newComp, changedAttributes):
+        """
+        Change the rows of oldComp to the attributes of newComp. The entries are replaced
+        as a whole, only the changed columns of the PV row are updated.
+        """
+        compID = oldComp.component_id
+        newAttributes = newComp.mainAttributes
+        for attribName in changedAttributes:
+            if( attribName in beastDeltaFile.entryTables ):
+                tableName = beastDeltaFile.entryTables[attribName]
+                self.deletedIDs[tableName].append( compID )
+                self.addEntryRows( tableName, compID, newAttributes[attribName] )
+            elif( attribName == "pv" ):
+                oldPV = oldComp.mainAttributes["pv"]
+                newPV = newAttributes["pv"]
+                if( newPV is None ):
+                    self.deletedIDs["PV"].append( compID )
+                elif( oldPV is None ):
+                    self.makeAlarmPVs( compID, newPV )
+                else:
+                    pvColumns = dict( beastSQLFile.tableColumns )["PV"][1:]
+                    self.pvUpdates.append( (compID, [ (column, newPV.get( column )) for column in pvColumns if newPV.get( column ) != oldPV.get( column ) ]) )
+        self.modifiedIDs.append( compID )
+        return
+
+
+    def getSummary(self):
+        return "{0} deleted, {1} modified and {2} new components for the BEAST alarm configuration made on {3}".format(
+                sum( [ len(levelIDs) for levelIDs in self.removedLevels ] ), len(self.modifiedIDs),
+                len(self.tableRows["ALARM_TREE"]), self.configTime )
+
+    def makeIDChunks(self, compIDs):
+        """ Generate the parts of the list of IDs for the IN (...) lists, idsPerStatement IDs in each """
+        for first in xrange( 0, len(compIDs), self.idsPerStatement ):
+            yield tuple( compIDs[first:first + self.idsPerStatement] )
+        return
+
+    def makeIDLists(self, compIDs):
+        """ Generate the text of the IN (...) lists for the IDs """
+        for idChunk in self.makeIDChunks( compIDs ):
+            yield ", ".join( [ str( compID ) for compID in idChunk ] )
+        return
+
+    def makeStatements(self):
+        """
+        Generate the statements of the script. The ALARM_TREE rows are deleted
+        from the bottom of the removed subtrees up, so no row is deleted before its children.
+        """
+        quoteValue = beastSQLFile.quoteValue
+        for (tableName, columns) in reversed( beastSQLFile.tableColumns[1:] ):
+            for idList in self.makeIDLists( self.deletedIDs[tableName] ):
+                yield "DELETE FROM {0} WHERE COMPONENT_ID IN ({1});\n".format( tableName, idList )
+        for levelIDs in reversed( self.removedLevels ):
+            for idList in self.makeIDLists( levelIDs ):
+                yield "DELETE FROM ALARM_TREE WHERE COMPONENT_ID IN ({0});\n".format( idList )
+        for (compID, changedColumns) in self.pvUpdates:
+            setList = ", ".join( [ "{0} = {1}".format( column, quoteValue( value ) ) for (column, value) in changedColumns ] )
+            yield "UPDATE PV SET {0} WHERE COMPONENT_ID = {1};\n".format( setList, compID )
+        for idList in self.makeIDLists( self.modifiedIDs ):
+            yield "UPDATE ALARM_TREE SET CONFIG_TIME = {0} WHERE COMPONENT_ID IN ({1});\n".format( quoteValue( self.configTime ), idList )
+        for insertText in beastSQLFile.makeStatements( self ):
+            yield insertText
+        return
+
+    def makeBatches(self, placeholder="%s"):
+        """ Same as beastSQLFile.makeBatches, with the DELETEs and UPDATEs in front of the INSERTs """
+        # The DELETEs take the IDs in IN (...) lists, executemany would run them one by one
+        deleteChunks = [ (tableName, self.deletedIDs[tableName]) for (tableName, columns) in reversed( beastSQLFile.tableColumns[1:] ) ]
+        deleteChunks += [ ("ALARM_TREE", levelIDs) for levelIDs in reversed( self.removedLevels ) ]
+        for (tableName, compIDs) in deleteChunks:
+            for idChunk in self.makeIDChunks( compIDs ):
+                yield ( "DELETE FROM {0} WHERE COMPONENT_ID IN ({1})".format( tableName, ", ".join( [placeholder] * len(idChunk) ) ), [ idChunk ] )
+        # The PV rows with the same changed columns are updated with the same statement
+        updatedColumns = []
+        updateRows = {}
+        for (compID, changedColumns) in self.pvUpdates:
+            columns = tuple( [ column for (column, value) in changedColumns ] )
+            if( columns not in updateRows ):
+                updatedColumns.append( columns )
+                updateRows[columns] = []
+            updateRows[columns].append( tuple( [ value for (column, value) in changedColumns ] ) + (compID,) )
+        for columns in updatedColumns:
+            setList = ", ".join( [ "{0} = {1}".format( column, placeholder ) for column in columns ] )
+            yield ( "UPDATE PV SET {0} WHERE COMPONENT_ID = {1}".format( setList, placeholder ), updateRows[columns] )
+        if( len(self.modifiedIDs) > 0 ):
+            yield ( "UPDATE ALARM_TREE SET CONFIG_TIME = {0} WHERE COMPONENT_ID = {0}".format( placeholder ),
+                    [ (self.configTime, compID) for compID in self.modifiedIDs ] )
+        for batch in beastSQLFile.makeBatches( self, placeholder ):
+            yield batch
+        return
+
+# End of "beastDeltaFile" class definition
@@ -0,0 +1,155 @@
+'''
+Created on October 18, 2026
+
+This file contains a class that makes the SQL script to load an alarm
+tree into the BEAST MySQL database. It takes the calls of makeAlarmEntries
+for each node, but collects the rows by table and writes them as
+multi-row INSERTs in a single transaction.
+
+@author: Hovanes Egiyan
+'''
+import time
+
+from componentIDAllocator import componentIDAllocator
+
+
+class beastSQLFile(object):
+    '''
+    Collector of the rows of the BEAST tables for the SQL script. The tables are
+    written in the order of tableColumns, so the ALARM_TREE rows come before the
+    rows that refer to them, and the parents come before their children.
+    '''
+
+    # Tables of the BEAST alarm configuration and their columns in the INSERTs
+    tableColumns = [ ("ALARM_TREE",         ("COMPONENT_ID", "PARENT_CMPNT_ID", "NAME", "CONFIG_TIME")),
+                     ("PV",                 ("COMPONENT_ID", "DESCR", "ENABLED_IND", "ANNUNCIATE_IND", "LATCH_IND",
+                                             "DELAY", "FILTER", "DELAY_COUNT", "ACT_GLOBAL_ALARM_IND")),
+                     ("GUIDANCE",           ("COMPONENT_ID", "GUIDANCE_ORDER", "TITLE", "DETAIL")),
+                     ("DISPLAY",            ("COMPONENT_ID", "DISPLAY_ORDER", "TITLE", "DETAIL")),
+                     ("COMMAND",            ("COMPONENT_ID", "COMMAND_ORDER", "TITLE", "DETAIL")),
+                     ("AUTOMATED_ACTION",   ("COMPONENT_ID", "AUTO_ACTION_ORDER", "TITLE", "DETAIL", "DELAY")) ]
+
+    @classmethod
+    def quoteValue(cls, value):
+        """ Return the MySQL literal for the value """
+        if( value is None ):
+            return "NULL"
+        if( isinstance( value, bool ) ):
+            return str( int( value ) )
+        if( isinstance( value, (int, long, float) ) ):
+            return str( value )
+        if( isinstance( value, unicode ) ):
+            value = value.encode( "utf-8" )
+        else:
+            value = str( value )
+        return "'" + value.replace( "\\", "\\\\" ).replace( "'", "\\'" ).replace( "\0", "\\0" ) + "'"
+
+
+    def __init__(self, idAllocator=None, configTime=None, rowsPerInsert=1000):
+        '''
+        Constructor. The COMPONENT_IDs of the new entries are taken from idAllocator,
+        configTime is written into the CONFIG_TIME column, the current time if it is None.
+        Each INSERT has at most rowsPerInsert rows.
+        '''
+        if( idAllocator is None ):
+            idAllocator = componentIDAllocator()
+        if( configTime is None ):
+            configTime = time.strftime( "%Y-%m-%d %H:%M:%S" )
+        self.idAllocator    = idAllocator       # Gives the COMPONENT_IDs of the new entries
+        self.configTime     = configTime        # CONFIG_TIME of the new entries
+        self.rowsPerInsert  = rowsPerInsert     # Largest number of rows in one INSERT
+        self.tableRows      = {}                # Lists of the row tuples by table name
+        for (tableName, columns) in beastSQLFile.tableColumns:
+            self.tableRows[tableName] = []
+        return
+
+    def getRowCount(self):
+        """ Return the number of rows collected for all tables """
+        return sum( [ len(rows) for rows in self.tableRows.values() ] )
+
+
+    def makeCommentLine(self, commentLine):
+        """ The script is written by table, there is no place for the comments of the nodes """
+        return
+
+    def makeAlarmEntry(self, parBeastID, entryName):
+        """ Add the ALARM_TREE row of a new entry under parBeastID and return its COMPONENT_ID """
+        beastID = self.idAllocator.getNextID()
+        self.tableRows["ALARM_TREE"].append( (beastID, parBeastID, entryName, self.configTime) )
+        return beastID
+
+    def makeAlarmPVs(self, beastID, pvAttributes):
+        """ Add the PV row for the entry, pvAttributes is the map with the PV columns """
+        if( not pvAttributes ):
+            return
+        pvColumns = beastSQLFile.tableColumns[1][1]
+        self.tableRows["PV"].append( (beastID,) + tuple( [ pvAttributes.get( column ) for column in pvColumns[1:] ] ) )
+        return
+
+    def makeAlarmGuidances(self, beastID, guidances):
+        self.addEntryRows( "GUIDANCE", beastID, guidances )
+        return
+
+    def makeAlarmDisplays(self, beastID, displays):
+        self.addEntryRows( "DISPLAY", beastID, displays )
+        return
+
+    def makeAlarmCommands(self, beastID, commands):
+        self.addEntryRows( "COMMAND", beastID, commands )
+        return
+
+    def makeAlarmAutomatedActions(self, beastID, actions):
+        self.addEntryRows( "AUTOMATED_ACTION", beastID, actions )
+        return
+
+    def addEntryRows(self, tableName, beastID, entries):
+        """ Add the rows of the table for the entries (maps with the columns) of the component """
+        entryColumns = dict( beastSQLFile.tableColumns )[tableName][1:]
+        tableRows = self.tableRows[tableName]
+        for entry in entries:
+            tableRows.append( (beastID,) + tuple( [ entry.get( column ) for column in entryColumns ] ) )
+        return
+
+
+    def makeInserts(self, tableName):
+        """ Generate the INSERT statements for the rows of the table, rowsPerInsert rows in each """
+        columns = dict( beastSQLFile.tableColumns )[tableName]
+        header = "INSERT INTO {0} ({1}) VALUES\n".format( tableName, ", ".join( columns ) )
+        quoteValue = beastSQLFile.quoteValue
+        rows = self.tableRows[tableName]
+        for first in xrange( 0, len(rows), self.rowsPerInsert ):
+            rowTexts = [ "(" + ", ".join( [ quoteValue( value ) for value in row ] ) + ")" for row in rows[first:first + self.rowsPerInsert] ]
+            yield header + ",\n".join( rowTexts ) + ";\n"
+        return
+
+    def makeStatements(self):
+        """ Generate the statements of the script """
+        for (tableName, columns) in beastSQLFile.tableColumns:
+            for insertText in self.makeInserts( tableName ):
+                yield insertText
+        return
+
+    def makeBatches(self, placeholder="%s"):
+        """
+        Generate (statement, list of parameter rows) with the same changes as makeStatements
+        for executemany, placeholder is the parameter marker of the DB module
+        """
+        for (tableName, columns) in beastSQLFile.tableColumns:
+            if( len(self.tableRows[tableName]) > 0 ):
+                yield ( "INSERT INTO {0} ({1}) VALUES ({2})".format( tableName, ", ".join( columns ), ", ".join( [placeholder] * len(columns) ) ),
+                        self.tableRows[tableName] )
+        return
+
+    def getSummary(self):
+        return "{0} rows for the BEAST alarm configuration made on {1}".format( self.getRowCount(), self.configTime )
+
+    def write(self, outFile):
+        """ Write the script with all collected rows into the open file, all of it in one transaction """
+        outFile.write( "-- {0}\n".format( self.getSummary() ) )
+        outFile.write( "START TRANSACTION;\n" )
+        for statementText in self.makeStatements():
+            outFile.write( statementText )
+        outFile.write( "COMMIT;\n" )
+        return
+
+# End of "beastSQLFile" class definition
@@ -0,0 +1,139 @@
+'''
+Created on October 18, 2026
+
+This file contains a class that compares two component trees in a
+single pass, matching the children of the two trees by name. A tree can
+also be compared with the stored fingerprints of an older tree.
+
+@author: Hovanes Egiyan
+'''
+import json
+
+
+class componentDiff(object):
+    '''
+    Result of the comparison of an old and a new component tree. The
+    components are keyed by their full path in the tree they belong to.
+    '''
+
+    @classmethod
+    def areEqual(cls, oldTree, newTree):
+        """ Return True if the trees have no differences, stops at the first difference """
+        return cls( oldTree, newTree, True ).isEmpty()
+
+    @classmethod
+    def saveFingerprints(cls, tree, fileName):
+        """ Store the fingerprints of the tree in a JSON file """
+        outFile = open( fileName, 'w' )
+        json.dump( tree.exportFingerprints(), outFile )
+        outFile.close()
+        return
+
+    @classmethod
+    def loadFingerprints(cls, fileName):
+        """ Read the fingerprints stored by saveFingerprints """
+        inFile = open( fileName, 'r' )
+        fingerprints = json.load( inFile )
+        inFile.close()
+        return fingerprints
+
+    @classmethod
+    def fromFingerprints(cls, fingerprints, newTree):
+        """
+        Compare the tree with the fingerprints exported from an older tree. The
+        subtrees with unchanged fingerprints are skipped. The removed components
+        are only known by their path, so they are stored with None, and the
+        modified ones are stored as (None, new component, ["fingerprint"]).
+        """
+        treeDiff = cls( None, None )
+        newTree.computeFingerprints()
+        workList = [ newTree ]
+        while( len(workList) > 0 ):
+            comp = workList.pop()
+            compPath = comp.getFullPath()
+            if( compPath not in fingerprints ):
+                treeDiff.added[compPath] = comp
+                continue
+            (oldFingerprint, oldContentHash, oldChildNames) = fingerprints[compPath]
+            if( oldFingerprint == comp.fingerprint ):
+                continue
+            if( oldContentHash != comp.getContentHash() ):
+                treeDiff.modified[compPath] = (None, comp, ["fingerprint"])
+            for childName in oldChildNames:
+                if( comp.getChild( childName ) is None ):
+                    treeDiff.removed[compPath + "/" + childName] = None
+            workList.extend( comp.children )
+        return treeDiff
+
+
+    def __init__(self, oldTree, newTree, stopAtFirst=False, descendModified=True, useFingerprints=False):
+        '''
+        Constructor. Walks both trees together and fills the differences.
+        With stopAtFirst the walk ends as soon as one difference is found,
+        without descendModified the children of modified components are not compared.
+        The subtrees with the same fingerprints are skipped, with useFingerprints the
+        fingerprints are computed first, otherwise only the already known ones are used.
+        '''
+        self.added      = {}    # Components of the new tree that are not in the old one
+        self.removed    = {}    # Components of the old tree that are not in the new one
+        self.modified   = {}    # (old component, new component, list of changed attributes)
+        if( useFingerprints and oldTree is not None and newTree is not None ):
+            oldTree.computeFingerprints()
+            newTree.computeFingerprints()
+        self.compareTrees( oldTree, newTree, stopAtFirst, descendModified )
+        return
+
+    def __str__(self):
+        retString = "Added {0}, removed {1}, modified {2} components".format( len(self.added), len(self.removed), len(self.modified) )
+        for compPath in sorted( self.added.keys() ):
+            retString += "\n+ " + compPath
+        for compPath in sorted( self.removed.keys() ):
+            retString += "\n- " + compPath
+        for compPath in sorted( self.modified.keys() ):
+            retString += "\n* " + compPath + " " + ", ".join( self.modified[compPath][2] )
+        return retString
+
+    def isEmpty(self):
+        """ Return True if no differences were found """
+        return len(self.added) == 0 and len(self.removed) == 0 and len(self.modified) == 0
+
+
+    def compareTrees(self, oldTree, newTree, stopAtFirst, descendModified):
+        """
+        Walk the pairs of components with the same name in both trees with a
+        worklist and record the differences
+        """
+        if( oldTree is None or newTree is None or oldTree.name != newTree.name ):
+            if( oldTree is not None ):
+                self.removed[oldTree.getFullPath()] = oldTree
+            if( newTree is not None ):
+                self.added[newTree.getFullPath()] = newTree
+            return
+        workList = [ (oldTree, newTree) ]
+        while( len(workList) > 0 ):
+            (oldComp, newComp) = workList.pop()
+            if( oldComp.fingerprint is not None and oldComp.fingerprint == newComp.fingerprint ):
+                continue
+            changedAttributes = oldComp.getChangedAttributes( newComp )
+            if( len(changedAttributes) > 0 ):
+                self.modified[newComp.getFullPath()] = (oldComp, newComp, changedAttributes)
+                if( stopAtFirst ):
+                    return
+                if( not descendModified ):
+                    continue
+            for oldChild in oldComp.children:
+                newChild = newComp.getChild( oldChild.name )
+                if( newChild is None ):
+                    self.removed[oldChild.getFullPath()] = oldChild
+                    if( stopAtFirst ):
+                        return
+                else:
+                    workList.append( (oldChild, newChild) )
+            for newChild in newComp.children:
+                if( oldComp.getChild( newChild.name ) is None ):
+                    self.added[newChild.getFullPath()] = newChild
+                    if( stopAtFirst ):
+                        return
+        return
+
+# End of "componentDiff" class definition
@@ -0,0 +1,65 @@
+'''
+Created on October 18, 2026
+
+This file contains the class that hands out COMPONENT_IDs for the nodes
+of the BEAST alarm tree. Each build of a tree uses its own allocator, so
+the IDs do not depend on what else was built before in the same process.
+
+@author: Hovanes Egiyan
+'''
+
+
+class componentIDAllocator(object):
+    '''
+    Per-build counter of COMPONENT_IDs. The IDs are given out in the
+    construction order starting from firstID. Ranges of IDs can be reserved
+    for the subtrees (for example one range per detector), so that the
+    subtrees can be built independently and still get the same IDs.
+    '''
+
+    def __init__(self, firstID=1, lastID=None):
+        '''
+        Constructor. The allocator gives out the IDs from firstID up to lastID,
+        there is no upper limit if lastID is None.
+        '''
+        self.firstID    = firstID   # First ID of this allocator
+        self.lastID     = lastID    # Last ID that can be given out, None for no limit
+        self.nextID     = firstID   # ID that will be given out next
+        return
+
+    def getNextID(self):
+        """ Return the next COMPONENT_ID """
+        if( self.lastID != None and self.nextID > self.lastID ):
+            errMsg = "Ran out of component IDs in the range {0}-{1}".format( self.firstID, self.lastID )
+            print errMsg
+            raise Exception( errMsg )
+        compID = self.nextID
+        self.nextID += 1
+        return compID
+
+    def reserveRange(self, rangeSize):
+        """
+        Reserve the next rangeSize IDs and return a new allocator that gives
+        them out. The IDs of this allocator continue after the reserved range.
+        """
+        rangeAllocator = componentIDAllocator( self.nextID, self.nextID + rangeSize - 1 )
+        if( self.lastID != None and rangeAllocator.lastID > self.lastID ):
+            errMsg = "Cannot reserve {0} component IDs in the range {1}-{2}".format( rangeSize, self.firstID, self.lastID )
+            print errMsg
+            raise Exception( errMsg )
+        self.nextID += rangeSize
+        return rangeAllocator
+
+    def getRange(self, rangeIndex, rangeSize):
+        """
+        Return the allocator for the range number rangeIndex of size rangeSize
+        counting from the first ID of this allocator. This does not depend on
+        the order in which the ranges are asked for, so it can be used in
+        separate processes.
+        """
+        firstID = self.firstID + rangeIndex * rangeSize
+        return componentIDAllocator( firstID, firstID + rangeSize - 1 )
+
+
+
+# End of "componentIDAllocator" class definition
@@ -0,0 +1,164 @@
+'''
+Created on October 18, 2026
+
+This file contains the classes that hand out DB cursors to the threads
+that build the component trees, so that the subtrees can be loaded
+from the DB at the same time instead of through one shared cursor.
+
+@author: Hovanes Egiyan
+'''
+import Queue
+import threading
+from multiprocessing.pool import ThreadPool
+
+
+class connectionPool(object):
+    '''
+    Pool of DB connections shared by the threads. A connection is used by
+    one thread at a time, at most maxConnections connections are opened and
+    the threads wait for a free connection after that.
+    '''
+
+    @classmethod
+    def forMySQL(cls, maxConnections=4, **connectArgs):
+        """
+        Return a pool of MySQLdb connections made with connectArgs (host, user, passwd, db...),
+        the cursors give the rows as maps like beastComponentInDB expects
+        """
+        try:
+            import MySQLdb
+            import MySQLdb.cursors
+        except ImportError as importError:
+            errMsg = "Cannot make a MySQL connection pool: {0}".format( importError )
+            print errMsg
+            raise Exception( errMsg )
+        return cls( lambda: MySQLdb.connect( **connectArgs ), maxConnections,
+                    lambda con: con.cursor( MySQLdb.cursors.DictCursor ) )
+
+
+    def __init__(self, connect, maxConnections=4, makeCursor=None):
+        '''
+        Constructor. connect() has to return a new connection and makeCursor(connection)
+        a new cursor for it, the cursor() method of the connection is used if it is None.
+        '''
+        self.connect            = connect           # Function that opens a new connection
+        self.makeCursor         = makeCursor        # Function that makes a cursor for a connection
+        self.maxConnections     = maxConnections    # Largest number of open connections
+        self.nConnections       = 0                 # Number of the connections opened so far
+        self.idleConnections    = Queue.Queue()     # Connections that are not used by any thread
+        self.borrowedCursors    = {}                # Connections of the borrowed cursors, by id of the cursor
+        self.lock               = threading.Lock()  # Protects nConnections and borrowedCursors
+        return
+
+
+    def borrowCursor(self):
+        """ Return a cursor on a connection that no other thread uses, it has to be given back with returnCursor """
+        con = self.getConnection()
+        curs = self.newCursor( con )
+        with self.lock:
+            self.borrowedCursors[id(curs)] = con
+        return curs
+
+    def returnCursor(self, curs):
+        """ Give back the cursor from borrowCursor, its connection can be used by the other threads after that """
+        with self.lock:
+            con = self.borrowedCursors.pop( id(curs) )
+        self.releaseConnection( con )
+        return
+
+    def newCursor(self, con):
+        if( self.makeCursor is None ):
+            return con.cursor()
+        return self.makeCursor( con )
+
+    def getConnection(self):
+        """ Return an idle connection, open a new one if there is none and the limit is not reached yet """
+        try:
+            return self.idleConnections.get_nowait()
+        except Queue.Empty:
+            pass
+        with self.lock:
+            openNew = ( self.nConnections < self.maxConnections )
+            if( openNew ):
+                self.nConnections += 1
+        if( openNew ):
+            return self.connect()
+        return self.idleConnections.get()
+
+    def releaseConnection(self, con):
+        self.idleConnections.put( con )
+        return
+
+
+    def buildTree(self, root, nThreads=4):
+        """
+        Build the tree below the root level by level. The children of the components
+        of one level are loaded in nThreads threads, each with a cursor borrowed from
+        this pool. The root has to be made without building its tree. After the build
+        the components use the cursor of the root, as if the tree was built with it.
+        An exception is raised if a component is reached twice, which means a cycle.
+        """
+        sharedCursor = root.curs
+        root.children = []
+        visited = set( [root.getTreeKey()] )
+        threadPool = ThreadPool( nThreads )
+        try:
+            level = [ root ]
+            while( len(level) > 0 ):
+                nextLevel = []
+                for (parent, children) in zip( level, threadPool.map( self.loadChildren, level ) ):
+                    parent.curs = sharedCursor
+                    if( len(children) == 0 ):
+                        parent.markAsLeaf()
+                    for child in children:
+                        childKey = child.getTreeKey()
+                        if( childKey in visited ):
+                            errMsg = "Cycle in the hierarchy: {0} is its own ancestor under {1}".format( childKey, parent.getFullPath() )
+                            print errMsg
+                            raise Exception( errMsg )
+                        visited.add( childKey )
+                        parent.addChild( child )
+                        nextLevel.append( child )
+                level = nextLevel
+        finally:
+            threadPool.close()
+            threadPool.join()
+        return root.children
+
+    def loadChildren(self, parent):
+        """ Make the children of the component with a borrowed cursor, without adding them to it """
+        curs = self.borrowCursor()
+        try:
+            parent.curs = curs
+            return [ parent.makeChild( item ) for item in parent.findChildItems() ]
+        finally:
+            self.returnCursor( curs )
+
+# End of "connectionPool" class definition
+
+
+
+class threadConnectionPool(connectionPool):
+    '''
+    Pool with one connection for each thread, for the DB modules like sqlite3
+    whose connections can only be used in the thread that opened them.
+    '''
+
+    def __init__(self, connect, makeCursor=None):
+        connectionPool.__init__(self, connect, None, makeCursor)
+        self.threadData = threading.local()  # Connection of each thread
+        return
+
+    def getConnection(self):
+        """ Return the connection of the current thread, it is opened at the first call in the thread """
+        if( getattr( self.threadData, "connection", None ) is None ):
+            self.threadData.connection = self.connect()
+            with self.lock:
+                self.nConnections += 1
+        return self.threadData.connection
+
+    def releaseConnection(self, con):
+        """ The connection stays with its thread """
+        return
+
+# End of "threadConnectionPool" class definition
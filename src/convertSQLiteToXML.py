@@ -4,12 +4,15 @@ Created on Dec 7, 2017
 @author: Hovanes Egiyan
 '''
 import sys, string, getopt, os
+import json
+import multiprocessing
 from optparse import OptionParser
 
 from copy import deepcopy
-import lxml.etree
 
 from beastComponentFromSQLite import beastComponentFromSQLite
+from componentIDAllocator import componentIDAllocator
+from namedAlarmComponent import namedAlarmComponent
 from sqliteDB import sqliteDB
 from subsystem import subsystem
 
@@ -47,12 +50,28 @@ class clfOptions:
         parser.add_option( "-x", "--xml", 
                            action="store", dest="xml", type="string", metavar="XMLFile", 
                            default="tt.xml", help="Define file name for output XML file" )
+        parser.add_option( "-t", "--stream", 
+                           action="store_true", dest="stream", default=False, 
+                           help="Write each detector to the XML file as soon as it is converted" )
+        parser.add_option( "-j", "--jobs", 
+                           action="store", dest="jobs", type="int", metavar="N", 
+                           default=1, help="Convert the detectors in N parallel processes" )
+        parser.add_option( "-c", "--cache", 
+                           action="store", dest="cache", type="string", metavar="CacheFile", 
+                           default=None, help="Regenerate only the detectors changed since the XML in the CacheFile was made" )
+        parser.add_option( "-p", "--indexed-copy", 
+                           action="store", dest="indexedCopy", type="string", metavar="CopyFile", 
+                           default=None, help="Use a copy of the SQLiteFile with the missing indices made in CopyFile" )
         
         (opts, args) = parser.parse_args( argList )
         
         # Assign the elements of the dictionary to the parsed option values
         self.optionDict["SQLiteFile"]   = opts.sql
         self.optionDict["XMLFile"]      = opts.xml
+        self.optionDict["Stream"]       = opts.stream
+        self.optionDict["Jobs"]         = opts.jobs
+        self.optionDict["CacheFile"]    = opts.cache
+        self.optionDict["IndexedCopy"]  = opts.indexedCopy
         return
         
         
@@ -70,6 +89,105 @@ class clfOptions:
         return self.optionDict
 
 
+#===============================================================================
+# Functions for converting the detectors in parallel worker processes
+#===============================================================================
+workerRowIndex = None       # detector_hierarchy rows indexed by parent_id in a worker process
+detectorIDRange = 1000000   # Number of COMPONENT_IDs reserved for each detector, so the IDs do not depend on the process
+
+def initConversionWorker( sqlFileName ):
+    """ Open a read-only connection in the worker process and load the hierarchy once """
+    global workerRowIndex
+    workerRowIndex = sqliteDB.openForReading( sqlFileName, None, False ).loadHierarchyIndex()
+    return
+
+
+def convertDetector( detJob ):
+    """ 
+    Build the component tree for one detector in a worker process and return 
+    the pretty-printed XML for it, so that the parent process can stitch it into the file.
+    The job is the tuple (detector name, detector index)
+    """
+    (detName, detIndex) = detJob
+    for detRow in workerRowIndex.get( None, [] ) :
+        if( detRow["name"] == detName ):
+            return makeDetectorXML( detRow, workerRowIndex, componentIDAllocator().getRange( detIndex, detectorIDRange ) )
+    errMsg = "Cannot find detector <{0}>".format( detName )
+    print errMsg
+    raise Exception( errMsg )
+
+
+def makeDetectorXML( detRow, rowIndex, idAllocator ):
+    """ Build the component tree for the detector and return the pretty-printed XML for it, indented to be under the config tag """
+    detSubsystem = subsystem( None, detRow["id"], None, detRow, rowIndex )
+    sqlComp = beastComponentFromSQLite( detSubsystem, None, None, True, idAllocator )
+    return sqlComp.makeXMLText( 1 )
+
+
+def makeDetectorXMLs( detRows, rowIndex, idAllocator ):
+    """ Make the XML for the detectors one by one, so that only one detector tree is kept in memory at a time """
+    for (detIndex, detName) in enumerate( detRows.keys() ) :
+        print "Doing detector called ", detName
+        yield makeDetectorXML( detRows[detName], rowIndex, idAllocator.getRange( detIndex, detectorIDRange ) )
+    return
+
+
+def writeXMLPieces( xmlFileName, detXMLs ):
+    """ 
+    Write the XML pieces for the detectors into the file under the config tag. 
+    Without any detectors the tag is empty, as lxml writes it. 
+    """
+    outFile = open( xmlFileName, 'w' )
+    configOpened = False
+    for detXML in detXMLs :
+        if( not configOpened ):
+            outFile.write( '<config name="HallD">\n' )
+            configOpened = True
+        outFile.write( detXML )
+    if( configOpened ):
+        outFile.write( '</config>\n' )
+    else:
+        outFile.write( '<config name="HallD"/>\n' )
+    outFile.close()
+    return
+
+
+#===============================================================================
+# Functions for regenerating only the changed detectors
+#===============================================================================
+cacheVersion = 2    # Has to be changed when the XML made from the same DB content changes
+
+def loadDetectorCache( cacheFileName ):
+    """ 
+    Read the map from the detector names to the stamp of their rows and their XML 
+    from the cache file. Returns an empty map if there is no usable cache.
+    """
+    if( not os.path.exists( cacheFileName ) ):
+        return {}
+    cacheFile = open( cacheFileName, 'r' )
+    try:
+        cache = json.load( cacheFile )
+    except ValueError as errMsg:
+        print "Ignoring the bad cache file <{0}>: {1}".format( cacheFileName, errMsg )
+        cache = {}
+    cacheFile.close()
+    if( cache.get("version") != cacheVersion or cache.get("pvPrefix") != namedAlarmComponent.pvPrefix ):
+        return {}
+    return cache.get( "detectors", {} )
+
+
+def saveDetectorCache( cacheFileName, detectorCache ):
+    """ Write the cache next to the old one, then replace it so that it is never left half-written """
+    cache = {"version"      :   cacheVersion, 
+             "pvPrefix"     :   namedAlarmComponent.pvPrefix, 
+             "detectors"    :   detectorCache}
+    cacheFile = open( cacheFileName + ".tmp", 'w' )
+    json.dump( cache, cacheFile )
+    cacheFile.close()
+    os.rename( cacheFileName + ".tmp", cacheFileName )
+    return
+
+
 if __name__ == '__main__':
     print "Here we go"
 
@@ -78,21 +196,74 @@ if __name__ == '__main__':
     # Get the global options from the clfOptions class
     progOpts = globOptions
     
-    sqlObject = sqliteDB( progOpts.getOption("SQLiteFile") )
+    # The conversion only reads the DB, the workers read the same file as the main process
+    sqlObject = sqliteDB.openForReading( progOpts.getOption("SQLiteFile"), progOpts.getOption("IndexedCopy") )
     
-    detMap = sqlObject.getDetectors()
-    newElement = lxml.etree.Element( "config", name = "HallD" )
-    newElementTree = lxml.etree.ElementTree( newElement)
-    for detName in detMap.keys() :
-        print "Doing detector called ", detName
-        detID = detMap[detName]["id"]
-        detSubsystem = subsystem( sqlObject.curs, detID)
-        sqlComp = beastComponentFromSQLite( detSubsystem )
-        detElement = sqlComp.makeXMLElement( newElement )
-
-    # write the old tree into a new file
-    outFile = open( progOpts.getOption("XMLFile"), 'w' )          # Open the file for writing
-    newElementTree.write( outFile, pretty_print=True )
-    outFile.close()
+    if( progOpts.getOption("CacheFile") != None ):
+        # Regenerate the XML only for the detectors whose rows changed since the cached 
+        # XML was made, judging by the latest mtime and the number of rows of the detector
+        rowIndex = sqlObject.loadHierarchyIndex()
+        detRows = {}
+        for detRow in rowIndex.get( None, [] ) :
+            detRows[detRow["name"]] = detRow
+        oldCache = loadDetectorCache( progOpts.getOption("CacheFile") )
+        newCache = {}
+        changedJobs = []
+        for (detIndex, detName) in enumerate( detRows.keys() ) :
+            detStamp = sqlObject.getSubtreeStamp( rowIndex, detRows[detName] )
+            if( detName in oldCache and oldCache[detName]["stamp"] == detStamp ):
+                newCache[detName] = oldCache[detName]
+            else:
+                print "Detector ", detName, " has changed"
+                newCache[detName] = {"stamp" : detStamp, "xml" : None}
+                changedJobs.append( (detName, detIndex) )
+        print "Regenerating {0} of {1} detectors".format( len(changedJobs), len(detRows) )
+        if( progOpts.getOption("Jobs") > 1 and len(changedJobs) > 1 ):
+            workerPool = multiprocessing.Pool( progOpts.getOption("Jobs"), initConversionWorker, 
+                                               (sqlObject.fileName,) )
+            changedXMLs = workerPool.map( convertDetector, changedJobs )
+            workerPool.close()
+            workerPool.join()
+        else:
+            idAllocator = componentIDAllocator()
+            changedXMLs = [ makeDetectorXML( detRows[detName], rowIndex, idAllocator.getRange( detIndex, detectorIDRange ) ) 
+                            for (detName, detIndex) in changedJobs ]
+        for (detJob, detXML) in zip( changedJobs, changedXMLs ):
+            newCache[detJob[0]]["xml"] = detXML
+        writeXMLPieces( progOpts.getOption("XMLFile"), [ newCache[detName]["xml"] for detName in detRows.keys() ] )
+        saveDetectorCache( progOpts.getOption("CacheFile"), newCache )
+    elif( progOpts.getOption("Jobs") > 1 ):
+        # Convert the detectors in a pool of processes and write the XML pieces in the 
+        # same order of detectors as in the serial modes, as soon as they are ready 
+        detNames = sqlObject.getDetectors().keys()
+        detJobs = [ (detName, detIndex) for (detIndex, detName) in enumerate( detNames ) ]
+        workerPool = multiprocessing.Pool( progOpts.getOption("Jobs"), initConversionWorker, 
+                                           (sqlObject.fileName,) )
+        writeXMLPieces( progOpts.getOption("XMLFile"), workerPool.imap( convertDetector, detJobs ) )
+        workerPool.close()
+        workerPool.join()
+    elif( progOpts.getOption("Stream") ):
+        # Serialize every detector as soon as it is converted and drop it, so that only 
+        # one detector tree is kept in memory at a time
+        rowIndex = sqlObject.loadHierarchyIndex()
+        detRows = {}
+        for detRow in rowIndex.get( None, [] ) :
+            detRows[detRow["name"]] = detRow
+        idAllocator = componentIDAllocator()
+        writeXMLPieces( progOpts.getOption("XMLFile"), 
+                        makeDetectorXMLs( detRows, rowIndex, idAllocator ) )
+    else:
+        # Read the detector hierarchy in one go instead of querying it node by node
+        detMap = sqlObject.loadHierarchy()
+        detXMLs = []
+        idAllocator = componentIDAllocator()
+        for (detIndex, detName) in enumerate( detMap.keys() ) :
+            print "Doing detector called ", detName
+            detSubsystem = detMap[detName]
+            sqlComp = beastComponentFromSQLite( detSubsystem, None, None, True, 
+                                                idAllocator.getRange( detIndex, detectorIDRange ) )
+            detXMLs.append( sqlComp.makeXMLText( 1 ) )
+
+        # write the text of the detectors into a new file, the same as lxml would write the whole tree
+        writeXMLPieces( progOpts.getOption("XMLFile"), detXMLs )
     
-    
\ No newline at end of file
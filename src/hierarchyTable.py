@@ -0,0 +1,237 @@
+'''
+Created on October 18, 2026
+
+This file contains a class that keeps the detector_hierarchy table in
+columns instead of one subsystem object per row. It is meant for the
+jobs that go over the whole hierarchy and only need the id, parent,
+name, type and chanid of the detector elements.
+
+@author: Hovanes Egiyan
+'''
+from array import array
+
+from subsystemView import subsystemView
+
+
+class hierarchyTable(object):
+    '''
+    Columnar store of the detector_hierarchy table. The rows are kept in the
+    depth-first order of the tree, so the subtree of a row is the range of
+    positions from the row to subtreeEnd of the row. The children of the
+    row at position p are childPositions[childOffsets[p]:childOffsets[p+1]].
+    '''
+
+    noChannel   = -1        # Stored in the chanid column for the rows without chanid
+    leafSuffix  = ":alarm"  # Added to the names of the bottom rows, as in the subsystem trees
+
+    @classmethod
+    def fromCursor(cls, inCursor):
+        """ Read the detector_hierarchy table with a single query and make the table from it """
+        inCursor.execute( "SELECT id, parent_id, name, type, chanid, mtime FROM detector_hierarchy" )
+        return cls.fromRows( inCursor.fetchall() )
+
+    @classmethod
+    def fromRows(cls, rows):
+        """
+        Make the table from the (id, parent_id, name, type, chanid, mtime) rows.
+        The children are kept in the order of the rows and the rows that cannot be
+        reached from a detector (parent_id is NULL) are left out, as in the subsystem trees.
+        """
+        childRows = {}
+        for row in rows:
+            childRows.setdefault( row[1], [] ).append( row )
+        table = cls()
+        visited = set()
+        workList = [ (row, -1) for row in reversed( childRows.get( None, [] ) ) ]
+        while( len(workList) > 0 ):
+            (row, parentPosition) = workList.pop()
+            if( row[0] in visited ):
+                errMsg = "Cycle in the hierarchy: {0} is reached twice".format( row[0] )
+                print errMsg
+                raise Exception( errMsg )
+            visited.add( row[0] )
+            position = table.appendRow( row, parentPosition )
+            for childRow in reversed( childRows.get( row[0], [] ) ):
+                workList.append( (childRow, position) )
+        table.makeIndex()
+        return table
+
+
+    def __init__(self):
+        '''
+        Constructor. Makes an empty table, the rows are added with appendRow
+        in the depth-first order and makeIndex has to be called after that.
+        '''
+        self.ids            = array( 'l' )  # id column
+        self.parentIndex    = array( 'l' )  # Position of the parent row, -1 for the detectors
+        self.names          = []            # name column
+        self.types          = []            # type column, the same strings are shared
+        self.chanids        = array( 'l' )  # chanid column, noChannel if there is no chanid
+        self.mtimes         = []            # mtime column, the same strings are shared
+        self.depths         = array( 'l' )  # Level of the row in the tree, 0 for the detectors
+        self.childOffsets   = array( 'l' )  # Start of the children of each row in childPositions
+        self.childPositions = array( 'l' )  # Positions of the children grouped by the parent
+        self.subtreeEnd     = array( 'l' )  # Position after the last row of the subtree of each row
+        self.sharedStrings  = {}            # Strings of the type and mtime columns
+        self.positionByID   = None          # Map from id to position, made on demand
+        self.views          = {}            # subsystemView objects made for the rows, by position
+        return
+
+    def __len__(self):
+        return len(self.ids)
+
+
+    def appendRow(self, row, parentPosition):
+        """ Append the (id, parent_id, name, type, chanid, mtime) row and return its position """
+        self.ids.append( row[0] )
+        self.parentIndex.append( parentPosition )
+        self.names.append( row[2] )
+        self.types.append( self.sharedStrings.setdefault( row[3], row[3] ) )
+        if( row[4] is None ):
+            self.chanids.append( hierarchyTable.noChannel )
+        else:
+            self.chanids.append( row[4] )
+        self.mtimes.append( self.sharedStrings.setdefault( row[5], row[5] ) )
+        if( parentPosition < 0 ):
+            self.depths.append( 0 )
+        else:
+            self.depths.append( self.depths[parentPosition] + 1 )
+        return len(self.ids) - 1
+
+    def makeIndex(self):
+        """ Make the children index and the subtree ends after all rows were appended """
+        nRows = len(self.ids)
+        childCounts = array( 'l', [0] * (nRows + 1) )
+        for parentPosition in self.parentIndex:
+            if( parentPosition >= 0 ):
+                childCounts[parentPosition + 1] += 1
+        self.childOffsets = childCounts
+        for position in xrange( nRows ):
+            self.childOffsets[position + 1] += self.childOffsets[position]
+        self.childPositions = array( 'l', [0] * nRows )
+        nextSlot = array( 'l', self.childOffsets[:nRows] )
+        for position in xrange( nRows ):
+            parentPosition = self.parentIndex[position]
+            if( parentPosition >= 0 ):
+                self.childPositions[nextSlot[parentPosition]] = position
+                nextSlot[parentPosition] += 1
+        # The children come after their parent, so the ends are filled from the bottom
+        self.subtreeEnd = array( 'l', xrange( 1, nRows + 1 ) )
+        for position in xrange( nRows - 1, -1, -1 ):
+            if( not self.isLeaf( position ) ):
+                self.subtreeEnd[position] = self.subtreeEnd[self.childPositions[self.childOffsets[position + 1] - 1]]
+        self.positionByID = None
+        return
+
+
+    def findPosition(self, rowID):
+        """ Return the position of the row with the id, None if there is no such row """
+        if( self.positionByID is None ):
+            self.positionByID = dict( [ (self.ids[position], position) for position in xrange( len(self.ids) ) ] )
+        return self.positionByID.get( rowID )
+
+    def getChildPositions(self, position):
+        """ Return the positions of the children of the row """
+        return self.childPositions[self.childOffsets[position]:self.childOffsets[position + 1]]
+
+    def isLeaf(self, position):
+        return self.childOffsets[position] == self.childOffsets[position + 1]
+
+    def getName(self, position):
+        """ Return the name of the row as it is in the subsystem trees, with leafSuffix for the bottom rows """
+        if( self.isLeaf( position ) ):
+            return self.names[position] + hierarchyTable.leafSuffix
+        return self.names[position]
+
+    def getChanid(self, position):
+        """ Return the chanid of the row, None if there is no chanid """
+        if( self.chanids[position] == hierarchyTable.noChannel ):
+            return None
+        return self.chanids[position]
+
+    def getParentID(self, position):
+        """ Return the parent_id of the row, None for the detectors """
+        if( self.parentIndex[position] < 0 ):
+            return None
+        return self.ids[self.parentIndex[position]]
+
+
+    def getDetectorPositions(self):
+        """ Return the positions of the rows without parent in the table order """
+        return array( 'l', [ position for position in xrange( len(self.ids) ) if self.parentIndex[position] < 0 ] )
+
+    def getLeaves(self, first=0, end=None):
+        """ Return the positions of the bottom rows between first and end """
+        if( end is None ):
+            end = len(self.ids)
+        childOffsets = self.childOffsets
+        return array( 'l', [ position for position in xrange( first, end ) if childOffsets[position] == childOffsets[position + 1] ] )
+
+    def selectType(self, typeName, first=0, end=None):
+        """ Return the positions of the rows of the type between first and end """
+        if( end is None ):
+            end = len(self.ids)
+        types = self.types
+        return array( 'l', [ position for position in xrange( first, end ) if types[position] == typeName ] )
+
+    def getSubtreeRange(self, position):
+        """ Return (first, end) of the positions of the subtree under the row """
+        return (position, self.subtreeEnd[position])
+
+    def getFullNames(self, separator=":"):
+        """
+        Return the list of the full names of all rows made in one pass, the
+        names are the same as subsystem.getFullName gives for the rows
+        """
+        fullNames = [None] * len(self.ids)
+        for position in xrange( len(self.ids) ):
+            parentPosition = self.parentIndex[position]
+            if( parentPosition < 0 ):
+                fullNames[position] = self.getName( position )
+            else:
+                fullNames[position] = fullNames[parentPosition] + separator + self.getName( position )
+        return fullNames
+
+    def sliceSubtree(self, position):
+        """ Return a new table with the subtree under the row, the row becomes a detector in it """
+        (first, end) = self.getSubtreeRange( position )
+        subTable = hierarchyTable()
+        subTable.ids            = self.ids[first:end]
+        subTable.parentIndex    = array( 'l', [ parentPosition - first for parentPosition in self.parentIndex[first:end] ] )
+        subTable.parentIndex[0] = -1
+        subTable.names          = self.names[first:end]
+        subTable.types          = self.types[first:end]
+        subTable.chanids        = self.chanids[first:end]
+        subTable.mtimes         = self.mtimes[first:end]
+        subTable.depths         = array( 'l', [ depth - self.depths[first] for depth in self.depths[first:end] ] )
+        subTable.sharedStrings  = self.sharedStrings
+        subTable.makeIndex()
+        return subTable
+
+
+    def getView(self, position):
+        """
+        Return the subsystemView for the row. The views are only made for the rows
+        that are asked for and for their parents, the same view is returned each time.
+        """
+        if( position in self.views ):
+            return self.views[position]
+        chain = []
+        while( position >= 0 and position not in self.views ):
+            chain.append( position )
+            position = self.parentIndex[position]
+        for position in reversed( chain ):
+            parent = None
+            if( self.parentIndex[position] >= 0 ):
+                parent = self.views[self.parentIndex[position]]
+            self.views[position] = subsystemView( self, position, parent )
+        return self.views[chain[0]]
+
+    def getDetectorViews(self):
+        """ Return a map with the detector names as keys and their subsystemView as values """
+        retMap = {}
+        for position in self.getDetectorPositions():
+            retMap[self.names[position]] = self.getView( position )
+        return retMap
+
+# End of "hierarchyTable" class definition
@@ -5,12 +5,209 @@ Created on Aug 13, 2014
 '''
 
 #from beastFile import beastFile
+import hashlib
+import json
+
+from componentDiff import componentDiff
+
+class componentList(list):
+    '''
+    List of the children of a component that also keeps the children in a 
+    map by name, so that the children can be found by name in constant time. 
+    The order of the list is kept, if there are several children with the same 
+    name the first one in the list is found. 
+    '''
+    __slots__ = ("nameIndex",)
+    
+    def __init__(self, components=[]):
+        list.__init__(self, components)
+        self.reindex()
+        return
+    
+    def reindex(self):
+        """ Rebuild the map of the children by name from the list """
+        self.nameIndex = {}     # Lists of children with the same name in the list order, by name
+        for comp in self:
+            self.nameIndex.setdefault( comp.name, [] ).append( comp )
+        return
+    
+    def getByName(self, compName):
+        """ Return the first child with the name, None if there is no such child """
+        sameName = self.nameIndex.get( compName )
+        if( sameName ):
+            return sameName[0]
+        return None
+    
+    def append(self, comp):
+        list.append( self, comp )
+        self.nameIndex.setdefault( comp.name, [] ).append( comp )
+        return
+    
+    def extend(self, components):
+        for comp in components:
+            self.append( comp )
+        return
+
+    def remove(self, comp):
+        """ Remove the component itself, not the first child that compares equal to it """
+        for position in xrange( len(self) ):
+            if( self[position] is comp ):
+                list.__delitem__( self, position )
+                self.dropFromIndex( comp, comp.name )
+                return
+        raise ValueError( "componentList.remove(x): x not in list" )
+    
+    def dropFromIndex(self, comp, compName):
+        """ Remove the component from the map under compName, return False if it was not there """
+        sameName = self.nameIndex.get( compName, [] )
+        for position in xrange( len(sameName) ):
+            if( sameName[position] is comp ):
+                del sameName[position]
+                if( len(sameName) == 0 ):
+                    del self.nameIndex[compName]
+                return True
+        return False
+    
+    def renameChild(self, comp, oldName):
+        """ 
+        Move the child in the map after its name was changed from oldName, 
+        return False if the component is not in this list 
+        """
+        if( not self.dropFromIndex( comp, oldName ) ):
+            return False
+        sameName = self.nameIndex.setdefault( comp.name, [] )
+        sameName.append( comp )
+        if( len(sameName) > 1 ):
+            self.reindex()
+        return True
+
+    # The rest of the operations that change the list are rare, the map is rebuilt for them 
+    def insert(self, position, comp):
+        list.insert( self, position, comp )
+        self.reindex()
+        return
+
+    def pop(self, position=-1):
+        comp = list.pop( self, position )
+        self.reindex()
+        return comp
+
+    def __setitem__(self, position, value):
+        list.__setitem__( self, position, value )
+        self.reindex()
+        return
+
+    def __delitem__(self, position):
+        list.__delitem__( self, position )
+        self.reindex()
+        return
+
+    def __setslice__(self, first, last, components):
+        list.__setslice__( self, first, last, components )
+        self.reindex()
+        return
+
+    def __delslice__(self, first, last):
+        list.__delslice__( self, first, last )
+        self.reindex()
+        return
+
+    def __iadd__(self, components):
+        self.extend( components )
+        return self
+
+    def sort(self, *args, **kwargs):
+        list.sort( self, *args, **kwargs )
+        self.reindex()
+        return
+
+    def reverse(self):
+        list.reverse( self )
+        self.reindex()
+        return
+
+# End of "componentList" class definition
+
+
+
+class emptyComponentList(componentList):
+    '''
+    Empty list of children shared by all components without children. 
+    It cannot be changed, a component gets its own componentList when 
+    the first child is added with addChild. 
+    '''
+    __slots__ = ()
+
+    def refuseChange(self, *args, **kwargs):
+        errMsg = "The shared empty list of children cannot be changed, use addChild"
+        print errMsg
+        raise TypeError( errMsg )
+
+    append = extend = remove = insert = pop = refuseChange
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = __iadd__ = refuseChange
+    sort = reverse = refuseChange
+
+# End of "emptyComponentList" class definition
+
+noChildren = emptyComponentList()   # Children of all components without children
+
+
+
+class componentPathIndex(object):
+    '''
+    Maps from the full path and from the PV name to the components of one tree. 
+    It is kept in the root component and is updated by insertComponent and 
+    removeComponent, renaming or moving a component makes the index to be rebuilt. 
+    If several components have the same path the first one in the tree is kept, 
+    the same as getChild does.
+    '''
+    __slots__ = ("byPath", "byPVName", "pvPrefix")
+
+    def __init__(self, root):
+        self.byPath     = {}    # Components by the full path with "/" separators
+        self.byPVName   = {}    # Components without children by the PV name
+        self.pvPrefix   = namedAlarmComponent.pvPrefix  # PV prefix used for the PV names
+        self.addSubtree( root )
+        return
+
+    def addSubtree(self, top):
+        """ Add all components of the subtree under top to the maps """
+        workList = [ top ]
+        while( len(workList) > 0 ):
+            comp = workList.pop()
+            self.byPath.setdefault( comp.getFullPath(), comp )
+            if( len(comp.children) == 0 ):
+                self.byPVName.setdefault( comp.getAlarmPVName(), comp )
+            workList.extend( reversed( comp.children ) )
+        return
+
+    def removeSubtree(self, top):
+        """ Remove all components of the subtree under top from the maps """
+        workList = [ top ]
+        while( len(workList) > 0 ):
+            comp = workList.pop()
+            compPath = comp.getFullPath()
+            if( self.byPath.get( compPath ) is comp ):
+                del self.byPath[compPath]
+            if( len(comp.children) == 0 ):
+                pvName = comp.getAlarmPVName()
+                if( self.byPVName.get( pvName ) is comp ):
+                    del self.byPVName[pvName]
+            workList.extend( comp.children )
+        return
+
+# End of "componentPathIndex" class definition
+
+
 
 class namedAlarmComponent(object):
     '''
     class to handle hierarchy structure and EPICS alarm entry making
-    for the nodes and PVs
+    for the nodes and PVs. The attributes are kept in slots and the caches 
+    are only made when they are used, the trees can have many thousands of nodes.
     '''
+    __slots__ = ("childList", "ancestorCache", "fullNameCache", "compName", "parentComp", "contentHash", "fingerprint", "pathIndex")
+
     pvPrefix = ""
     
     @classmethod
@@ -23,7 +220,7 @@ class namedAlarmComponent(object):
         newComp = namedAlarmComponent( component.name, parent )
         for child in component.children:
             newChild = namedAlarmComponent.copyOfNamedAlarmComponent(child, newComp)
-            newComp.children.append(newChild)
+            newComp.addChild(newChild)
         return newComp
     
 
@@ -31,20 +228,76 @@ class namedAlarmComponent(object):
         '''
         Constructor
         '''
-        self.name = compName
-        self.children = []  
-        self.parentSys = parent
+        self.childList = noChildren # Storage for the children property
+        self.ancestorCache = None   # Ancestors found by findCachedAncestor, by the cache key
+        self.fullNameCache = None   # Full names of this component, by the separator
+        self.compName = compName    # Storage for the name property
+        self.parentComp = parent    # Storage for the parentSys property
+        self.contentHash = None     # Hash of the own content of this component, computed on demand
+        self.fingerprint = None     # Hash of the content of the whole subtree, computed on demand
+        self.pathIndex = None       # componentPathIndex of the tree, only in the root and made on demand
         return
     
-    def __del__(self):
-        """
-        Delete all children of this object
+    
+    def getName(self):
+        return self.compName
+    
+    def setName(self, compName):
+        """ 
+        Set the name, the full names cached in this subtree become invalid. The path 
+        index of the tree is only dropped if the component is already in the tree.
         """
-        for child in self.children:
-            self.children.remove(child)
-            del child            
+        if( compName != self.compName ):
+            oldName = self.compName
+            self.compName = compName
+            inTree = ( self.parentComp is None )
+            if( self.parentComp is not None ):
+                inTree = self.parentComp.getLoadedChildren().renameChild( self, oldName )
+            self.invalidateFullNameCache()
+            self.invalidateFingerprint()
+            if( inTree ):
+                self.invalidatePathIndex()
         return
-        
+
+    name = property( getName, setName )
+
+    def getParentSys(self):
+        return self.parentComp
+
+    def setParentSys(self, parent):
+        """ Set the parent, the full names and ancestors cached in this subtree become invalid """
+        if( parent is not self.parentComp ):
+            if( self.parentComp is not None ):
+                self.parentComp.invalidateFingerprint( False )
+                self.parentComp.invalidatePathIndex()
+            self.invalidatePathIndex()
+            self.parentComp = parent
+            if( parent is not None ):
+                parent.invalidateFingerprint( False )
+            self.invalidateFullNameCache()
+            self.invalidateAncestorCache()
+        return
+
+    parentSys = property( getParentSys, setParentSys )
+
+    def getChildren(self):
+        """ The children of the lazily loaded components are made the first time they are asked for """
+        if( self.childList is None ):
+            self.loadChildren()
+        return self.childList
+
+    def setChildren(self, children):
+        """ The children are always kept in a componentList to be able to find them by name """
+        if( len(children) == 0 ):
+            self.childList = noChildren
+        else:
+            self.childList = componentList( children )
+        self.invalidateFingerprint( False )
+        self.invalidatePathIndex()
+        return
+
+    children = property( getChildren, setChildren )
+    
     def __str__(self):
         retString = "\nComponent with name {0}".format( self.name )
         if( len(self.children)>0 ) : 
@@ -74,10 +327,117 @@ class namedAlarmComponent(object):
         return nameList
 
     def getChild(self, childName ):
-        for child in self.children:
-            if( child.name == childName ):
-                return child
-        return None
+        """ Return the child with the name, the children are indexed by name """
+        return self.children.getByName( childName )
+
+    def getLoadedChildren(self):
+        """ Return the children without loading them, the components not loaded yet have none """
+        if( self.childList is None ):
+            return noChildren
+        return self.childList
+
+    def setPendingChildren(self):
+        """ Mark the children as not loaded yet, they are loaded by loadChildren on the first access """
+        self.childList = None
+        return
+
+    def loadChildren(self):
+        """
+        Make the children of a lazily loaded component from findChildItems() and makeChild(). 
+        The children are not built further, they load their own children when asked for. 
+        An exception is raised if a child is also an ancestor of this component.
+        """
+        self.childList = noChildren
+        ancestorKeys = set()
+        comp = self
+        while( comp is not None ):
+            ancestorKeys.add( comp.getTreeKey() )
+            comp = comp.parentSys
+        for item in self.findChildItems():
+            child = self.makeChild( item )
+            if( child.getTreeKey() in ancestorKeys ):
+                errMsg = "Cycle in the hierarchy: {0} is its own ancestor under {1}".format( child.getTreeKey(), self.getFullPath() )
+                print errMsg
+                raise Exception( errMsg )
+            self.addChild( child )
+        return
+
+    def addChild(self, child):
+        """ 
+        Append the child, the shared empty list is replaced with an own list for the first child. 
+        The fingerprints of this component and above it are forgotten. 
+        """
+        if( self.childList is noChildren ):
+            self.childList = componentList()
+        self.childList.append( child )
+        self.invalidateFingerprint( False )
+        return
+
+
+    def buildSubtree(self):
+        """
+        Build the tree below this component without recursion. A worklist of 
+        (parent, item) pairs is processed depth-first so that the children are 
+        created in the same order as a recursive construction would create them. 
+        The derived classes provide the hooks findChildItems(), makeChild(), 
+        markAsLeaf() and getTreeKey(). An exception is raised if the same 
+        component is reached twice, which means there is a cycle in the hierarchy.
+        """
+        self.children = []
+        visited = set( [self.getTreeKey()] )
+        workList = []
+        self.addChildItems( workList )
+        while( len(workList) > 0 ):
+            (parent, item) = workList.pop()
+            child = parent.makeChild( item )
+            childKey = child.getTreeKey()
+            if( childKey in visited ):
+                errMsg = "Cycle in the hierarchy: {0} is its own ancestor under {1}".format( childKey, parent.getFullPath() )
+                print errMsg
+                raise Exception( errMsg )
+            visited.add( childKey )
+            parent.addChild( child )
+            child.addChildItems( workList )
+        return self.children
+
+    def addChildItems(self, workList):
+        """
+        Put the items for the children of this component on the worklist in the 
+        reversed order, so that they are popped in the original order 
+        """
+        childItems = self.findChildItems()
+        if( len(childItems) == 0 ):
+            self.markAsLeaf()
+        for item in reversed( childItems ):
+            workList.append( (self, item) )
+        return
+
+    def findChildItems(self):
+        """
+        Return the list of items (DB rows, subsystems) from which the children 
+        of this component are made by makeChild() 
+        """
+        return []
+
+    def makeChild(self, item):
+        """
+        Create the child component from the item, without building its children 
+        """
+        errMsg = "makeChild is not defined for {0}".format( self.__class__.__name__ )
+        print errMsg
+        raise Exception( errMsg )
+
+    def markAsLeaf(self):
+        """
+        Called during the tree building for the components without children
+        """
+        return
+
+    def getTreeKey(self):
+        """
+        Return the key that identifies this component in the hierarchy 
+        """
+        return id( self )
 
 
     
@@ -89,56 +449,133 @@ class namedAlarmComponent(object):
         Here we assume that the only parameter that define the identity 
         of the component is its name and that a component cannot have the two children 
         with the same name. The fact that the names are same does not mean 
-        that the components are the same. 
+        that the components are the same, the components with changed attributes 
+        are also new. 
         """
         newCompDict = {}
-        if( component == None ):
+        if( component is None ):
             return newCompDict
-        
-        if( self.name != component.name ):
-            newCompDict[component.getFullPath()] = component
-            return newCompDict
-
-        if( len(component.children) > 0 ):
-            for othersChild in component.children:
-                if( othersChild.name not in self.getChildrenNames()  ) :
-                    newCompDict[othersChild.getFullName()] = othersChild
-                else :
-                    newCompsInChild = self.getChild( othersChild.name ).findNewComponents( othersChild )
-                    if( len(newCompsInChild) > 0 ) :
-                        newCompDict.update( newCompsInChild )
+        compDiff = componentDiff( self, component, False, False )
+        for comp in compDiff.added.values() + [ modified[1] for modified in compDiff.modified.values() ]:
+            newCompDict[comp.getDiffKey( component )] = comp
         return newCompDict
     
     
     def findMissingComponents(self, component):
+        """
+        Find the components of self that are not in the 'component' and return 
+        a map with them, the components with changed attributes are also missing. 
+        The key is going to be the full path to the missing components.
+        """
         missingCompDict = {}
-        if( component == None ):
-            missingCompDict[self.getFullPath()] = self
-            return missingCompDict
-
-        if( self.name != component.name ):
-            missingCompDict[self.getFullPath()] = self
-            return missingCompDict
-
-        if( len(self.children) > 0 ) :
-            for ownChild in self.children:
-                if( ownChild.name not in component.getChildrenNames() ) :
-                    missingCompDict[ownChild.getFullName()] = ownChild
-                else :
-                    missingCompDict.update( self.getChild( ownChild.name ).findMissingComponents( component.getChild( ownChild.name ) ) )
-                    
+        compDiff = componentDiff( self, component, False, False )
+        for comp in compDiff.removed.values() + [ modified[0] for modified in compDiff.modified.values() ]:
+            missingCompDict[comp.getDiffKey( self )] = comp
         return missingCompDict
     
     
+    def diff(self, component):
+        """
+        Compare this tree with the 'component' tree in one pass and return 
+        a componentDiff with the added, removed and modified components 
+        """
+        return componentDiff( self, component )
+    
+    def getChangedAttributes(self, component):
+        """
+        Return the list of names of the attributes that differ between this 
+        component and the 'component' with the same name. Only the name 
+        matters for this class, so the list is empty. 
+        """
+        return []
+    
+    def getDiffKey(self, comparedRoot):
+        """ Return the key for this component in the maps of new and missing components """
+        if( self is comparedRoot ):
+            return self.getFullPath()
+        return self.getFullName()
+    
+    
+    def getFingerprintContent(self):
+        """
+        Return the content of this component that goes into its fingerprint. 
+        Only the name matters for this class.
+        """
+        return {"name" : self.name}
+
+    def getContentHash(self):
+        """ Return the hash of the own content of this component """
+        if( self.contentHash is None ):
+            content = json.dumps( self.getFingerprintContent(), sort_keys=True, default=str )
+            self.contentHash = hashlib.sha1( content ).hexdigest()
+        return self.contentHash
+
+    def getFingerprint(self):
+        """
+        Return the Merkle-style hash of this subtree made from the hash of the own 
+        content and the fingerprints of the children. Two subtrees with the same 
+        fingerprint have the same content, so the comparison can skip them.
+        """
+        if( self.fingerprint is None ):
+            self.computeFingerprints()
+        return self.fingerprint
+
+    def computeFingerprints(self):
+        """
+        Compute the missing fingerprints in this subtree bottom-up with a worklist. 
+        The fingerprints of the children are sorted, the order of the children does not matter.
+        """
+        workList = [ (self, False) ]
+        while( len(workList) > 0 ):
+            (comp, childrenDone) = workList.pop()
+            if( comp.fingerprint is not None ):
+                continue
+            if( not childrenDone ):
+                workList.append( (comp, True) )
+                for child in comp.children:
+                    if( child.fingerprint is None ):
+                        workList.append( (child, False) )
+                continue
+            subtreeHash = hashlib.sha1( comp.getContentHash() )
+            for childFingerprint in sorted( [ child.fingerprint for child in comp.children ] ):
+                subtreeHash.update( childFingerprint )
+            comp.fingerprint = subtreeHash.hexdigest()
+        return
+
+    def invalidateFingerprint(self, contentChanged=True):
+        """
+        Forget the fingerprints of this component and of all components above it. 
+        Has to be called when the content of the component or its children change. 
+        """
+        if( contentChanged ):
+            self.contentHash = None
+        comp = self
+        while( comp is not None and comp.fingerprint is not None ):
+            comp.fingerprint = None
+            comp = comp.parentSys
+        return
+
+    def exportFingerprints(self):
+        """
+        Return a map from the full path of each component in this subtree to the list 
+        [fingerprint, content hash, names of the children], it can be stored as JSON 
+        and compared later with componentDiff.fromFingerprints without this tree 
+        """
+        self.computeFingerprints()
+        fingerprints = {}
+        workList = [ self ]
+        while( len(workList) > 0 ):
+            comp = workList.pop()
+            fingerprints[comp.getFullPath()] = [ comp.fingerprint, comp.getContentHash(), comp.getChildrenNames() ]
+            workList.extend( comp.children )
+        return fingerprints
+
+    
     def __eq__(self, component ):
-        if( len( self.findMissingComponents(component) ) != 0 or len( self.findNewComponents(component) ) != 0  ):
-            return False
-        return True
+        return componentDiff.areEqual( self, component )
     
     def __ne__(self, component ):
-        if( len( self.findMissingComponents(component) ) == 0 and len( self.findNewComponents(component) ) == 0  ):
-            return False
-        return True
+        return not componentDiff.areEqual( self, component )
 
     
 
@@ -146,49 +583,44 @@ class namedAlarmComponent(object):
         """
         Return the component specified by the path string in format "A/B/C/D/".
         This will return the component whose name is D on the forth layer of hierarchy 
-        with parenting sequence defined by the string above.
+        with parenting sequence defined by the string above. The children are found 
+        by name on each level, so only the components on the path are visited.
         """
+        comp = self
         if( relativePath == "" ):
-            return self
-        if( len(self.children) == 0 ):
-            return None      
-#        if( relativePath.find("/") == -1 ):
-        
-        listOfNames = relativePath.split( "/" )        
-        childName = listOfNames[0] 
-#         if( childName == '' ):
-#             return None             
-        child = self.getChild( childName )
-        if( child == None ) :
-            return None
-        else :
-#             if( len(listOfNames) == 1 ) :
-#                 return self
-#             else:
-            string2remove = childName 
-            if( len(listOfNames) > 1 ):
-                string2remove += "/"
-            return child.getSubComponent( relativePath.replace( string2remove, "" ) )
-            
-#         print "Name is ", self.name , " full name is ", self.getFullName()
-#         reducedPath = relativePath
-#         print "Original path is ", reducedPath
-#         string2remove = self.name+"/"
-#         print "String to remove is ", string2remove
-#         reducedPath = relativePath.replace( string2remove, "" )
-#         print "Reduced path is ", reducedPath
-#         
-#         # If we got to the bottom then return this component
-#         if( reducedPath == "" ) :
-#             return self
-#         # else go down to the next level
-#         else:
-#             for child in self.children :
-#                 subComp = child.getSubComponent( reducedPath )
-#                 if( subComp != None ) :
-#                     return subComp
-# #            print "Did not find subcomponent ", path, " in ", self.getFullPath()
-#             return None
+            return comp
+        for childName in relativePath.rstrip( "/" ).split( "/" ):
+            comp = comp.getChild( childName )
+            if( comp is None ):
+                return None
+        return comp
+
+
+    def getPathIndex(self):
+        """
+        Return the componentPathIndex of the tree, it is made at the first call 
+        and when the PV prefix was changed since it was made
+        """
+        root = self.getRootSystem()
+        if( root.pathIndex is None or root.pathIndex.pvPrefix != namedAlarmComponent.pvPrefix ):
+            root.pathIndex = componentPathIndex( root )
+        return root.pathIndex
+
+    def findByPath(self, fullPath):
+        """ Return the component of this tree with the full path as given by getFullPath(), None if there is none """
+        return self.getPathIndex().byPath.get( fullPath )
+
+    def findByPVName(self, pvName):
+        """ Return the component of this tree with the PV name as given by getAlarmPVName(), None if there is none """
+        return self.getPathIndex().byPVName.get( pvName )
+
+    def invalidatePathIndex(self):
+        """ Forget the path index of the tree, it is made again when it is used next time """
+        comp = self
+        while( comp.parentComp is not None ):
+            comp = comp.parentComp
+        comp.pathIndex = None
+        return
 
 
     def insertComponent(self, comp):
@@ -196,13 +628,18 @@ class namedAlarmComponent(object):
         Insert a new component into this component
         '''
         print "In  insertComponent for ", self.getFullPath(), " with ", comp.getFullPath()
-        if( comp.name in self.getChildrenNames() ):
+        if( self.getChild( comp.name ) is not None ):
             errMsg = "Subcomponent named {0} already exists in {1}".format(comp.name, self.getFullPath() )
             print errMsg
             raise Exception( errMsg )
 #        newComponent = namedAlarmComponent.copyOfNamedAlarmComponent(comp, self)
         newComponent = comp.__class__.copyComponent(comp, self)
-        self.children.append( newComponent )
+        self.addChild( newComponent )
+        newComponent.invalidateAncestorCache()
+        self.invalidateFingerprint( False )
+        root = self.getRootSystem()
+        if( root.pathIndex is not None ):
+            root.pathIndex.addSubtree( newComponent )
         return
     
     def removeComponent(self, comp):
@@ -211,32 +648,123 @@ class namedAlarmComponent(object):
         The component to be removed is deleted.
         '''
         print "In removeComponent for ", self.getFullPath(), " with ", comp.getFullPath()
-        if(  comp.name not in self.getChildrenNames() ):
+        if( self.getChild( comp.name ) is None ):
             errMsg = "Subcomponent named {0} does not exist in {1}".format(comp.name, self.getFullPath() )
             print errMsg
             raise Exception( errMsg )        
+        # Remove our own child with that name, comp may come from a different tree
+        comp = self.getChild( comp.name )
+        root = self.getRootSystem()
+        if( root.pathIndex is not None ):
+            root.pathIndex.removeSubtree( comp )
         self.children.remove(comp)
+        comp.invalidateAncestorCache()
+        self.invalidateFingerprint( False )
         del comp
         return
     
    
     def getRootSystem(self):
         """Find the top level subsystem (AREA) above this subsystem in the tree"""
-        if( self.parentSys == None ):
-            return self
-        else:
-            return self.parentSys.getRootSystem()
+        return self.findCachedAncestor( "root", lambda comp: comp.parentSys is None )
+
+
+    def findCachedAncestor(self, cacheKey, isMatch):
+        """
+        Return the closest component up the parent chain, starting from this one, 
+        for which isMatch(component) is true, or None if there is none. The result is 
+        stored under cacheKey in every component on the way, so that the next lookups 
+        from this component or from its children do not walk the chain again.
+        """
+        chain = []
+        found = None
+        comp = self
+        while( comp is not None ):
+            if( comp.ancestorCache is not None and cacheKey in comp.ancestorCache ):
+                found = comp.ancestorCache[cacheKey]
+                break
+            chain.append( comp )
+            if( isMatch( comp ) ):
+                found = comp
+                break
+            comp = comp.parentSys
+        for comp in chain:
+            if( comp.ancestorCache is None ):
+                comp.ancestorCache = {}
+            comp.ancestorCache[cacheKey] = found
+        return found
+
+    def invalidateAncestorCache(self):
+        """
+        Forget the cached ancestors of this component and all components below it. 
+        Has to be called when the subtree is moved to a different parent.
+        """
+        workList = [ self ]
+        while( len(workList) > 0 ):
+            comp = workList.pop()
+            comp.ancestorCache = None
+            workList.extend( comp.getLoadedChildren() )
+        return
 
    
     def getFullName(self, separator=":"):
         """Return the full path (or the PV name base) for this subsystem in the tree.
         The full path is the fully classified name of the detector element, the top level 
         element starting from the left. The detector levels are separated by a string give 
-        by the separator parameter"""
-        if( self.parentSys == None ):
-            return self.name
-        else:
-            return self.parentSys.getFullName(separator) + separator + self.name
+        by the separator parameter. The full names are cached in the components for each 
+        separator, so only the components without a cached name on the way up are visited"""
+        if( self.fullNameCache is not None and separator in self.fullNameCache ):
+            return self.fullNameCache[separator]
+        chain = []
+        comp = self
+        while( comp is not None and (comp.fullNameCache is None or separator not in comp.fullNameCache) ):
+            chain.append( comp )
+            comp = comp.parentSys
+        fullName = None
+        if( comp is not None ):
+            fullName = comp.fullNameCache[separator]
+        for comp in reversed( chain ):
+            if( fullName is None ):
+                fullName = comp.name
+            else:
+                fullName = fullName + separator + comp.name
+            comp.cacheFullName( separator, fullName )
+        return fullName
+    
+    def computeFullNames(self, separator=":"):
+        """
+        Fill the full names with the separator for all components in this 
+        subtree in one top-down pass 
+        """
+        self.getFullName( separator )
+        workList = [ self ]
+        while( len(workList) > 0 ):
+            comp = workList.pop()
+            parentName = comp.fullNameCache[separator]
+            for child in comp.children:
+                child.cacheFullName( separator, parentName + separator + child.name )
+                workList.append( child )
+        return
+
+    def cacheFullName(self, separator, fullName):
+        """ Store the full name for the separator, the map is made for the first name """
+        if( self.fullNameCache is None ):
+            self.fullNameCache = {}
+        self.fullNameCache[separator] = fullName
+        return
+
+    def invalidateFullNameCache(self):
+        """
+        Forget the cached full names of this component and all components below it. 
+        Has to be called when the name of the component or its parent changes.
+        """
+        workList = [ self ]
+        while( len(workList) > 0 ):
+            comp = workList.pop()
+            if( comp.fullNameCache is not None ):
+                comp.fullNameCache = None
+            workList.extend( comp.getLoadedChildren() )
+        return
     
     def getFullPath(self, separator = "/"):
         return separator + self.getFullName( separator )
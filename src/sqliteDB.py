@@ -5,10 +5,14 @@ Created on August 10, 2014
 '''
 #import _mysql
 import os
+import shutil
 import sys
+import urllib
 
 from beastComponentFromSQLite import beastComponentFromSQLite
+from connectionPool import threadConnectionPool
 #from beastComponentInDB import beastComponentInDB
+from hierarchyTable import hierarchyTable
 import sqlite3 as lite
 from subsystem import subsystem
 
@@ -18,16 +22,86 @@ class sqliteDB(object):
     Class to handle direct accesses to BEAST alarm systems MySQL DB
     '''
 
-    def __init__(self, dbFileName):
+    # Settings for the connections that only read the DB in bulk
+    readCacheSize   = -65536        # Page cache size, negative values are in KiB (64 MiB)
+    readMmapSize    = 268435456     # Size of the memory-mapped part of the DB file (256 MiB)
+    readTempStore   = "MEMORY"      # Keep the temporary tables and indices in memory
+    uriSupported    = None          # SQLite takes the "file:" URIs as file names, checked at the first read-only open
+
+    # Queries used for the node by node lookups, with the index that makes them index searches
+    hotQueries = [ ("SELECT * FROM detector_hierarchy WHERE id=?",                       "detector_hierarchy_id",        "(id)"),
+                   ("SELECT * FROM detector_hierarchy WHERE parent_id=?",                "detector_hierarchy_parent",    "(parent_id, id)"),
+                   ("SELECT * FROM detector_hierarchy WHERE parent_id IS NULL",          "detector_hierarchy_parent",    "(parent_id, id)"),
+                   ("SELECT EXISTS (SELECT 1 FROM detector_hierarchy WHERE parent_id=?)", "detector_hierarchy_parent",    "(parent_id, id)") ]
+
+    @classmethod
+    def openForReading(cls, dbFileName, indexedCopyName=None, checkPlans=True):
+        """
+        Open the DB read-only with the settings for bulk reading. 
+        With checkPlans the plans of the lookup queries are checked and a warning is printed 
+        for the ones that scan the whole table. If indexedCopyName is given, a copy of the DB 
+        with the missing indices is made under that name and opened instead.
+        """
+        dbObject = cls( dbFileName, True, cls.readCacheSize, cls.readMmapSize, cls.readTempStore )
+        if( not checkPlans ):
+            return dbObject
+        scanningQueries = dbObject.checkQueryPlans()
+        if( len(scanningQueries) > 0 and indexedCopyName != None ):
+            dbObject.con.close()
+            cls.makeIndexedCopy( dbFileName, indexedCopyName, scanningQueries )
+            dbObject = cls( indexedCopyName, True, cls.readCacheSize, cls.readMmapSize, cls.readTempStore )
+        return dbObject
+
+    @classmethod
+    def hasURISupport(cls):
+        """ 
+        Return True if SQLite was built with USE_URI. The sqlite3 module of Python 2 
+        does not ask for the URIs, so they only work when they are on by default.
+        """
+        if( sqliteDB.uriSupported == None ):
+            memoryCon = lite.connect( ":memory:" )
+            sqliteDB.uriSupported = ( "USE_URI" in [ optionRow[0] for optionRow in memoryCon.execute( "PRAGMA compile_options" ) ] )
+            memoryCon.close()
+        return sqliteDB.uriSupported
+
+    @classmethod
+    def makeIndexedCopy(cls, dbFileName, copyFileName, scanningQueries):
+        """
+        Copy the DB file and create the indices for the scanning queries (entries of hotQueries) 
+        in the copy. An existing copy is used if it is newer than the DB file. The file is copied 
+        as it is, so nothing should write into the DB while it is copied.
+        """
+        if( os.path.exists( copyFileName ) and os.path.getmtime( copyFileName ) >= os.path.getmtime( dbFileName ) ):
+            copyObject = cls( copyFileName, True )
+            if( len( copyObject.checkQueryPlans( False ) ) == 0 ):
+                copyObject.con.close()
+                return copyFileName
+            copyObject.con.close()
+        print "Making a copy of <{0}> with the indices in <{1}>".format( dbFileName, copyFileName )
+        shutil.copyfile( dbFileName, copyFileName + ".tmp" )
+        con = lite.connect( copyFileName + ".tmp" )
+        for (sql, indexName, indexColumns) in scanningQueries:
+            con.execute( "CREATE INDEX IF NOT EXISTS {0} ON detector_hierarchy {1}".format( indexName, indexColumns ) )
+        con.commit()
+        con.close()
+        os.rename( copyFileName + ".tmp", copyFileName )
+        return copyFileName
+
+
+    def __init__(self, dbFileName, readOnly=False, cacheSize=None, mmapSize=None, tempStore=None):
         '''
         Open the connection to the DB or 
-        throw an exception in case of failure 
+        throw an exception in case of failure. 
+        With readOnly the connection refuses any writes into the DB file. cacheSize, mmapSize 
+        and tempStore set the corresponding PRAGMAs, the SQLite defaults are used for the ones that are None.
         '''
 
         # Define data members for this class 
         self.fileName = dbFileName  # Filename to get the SQLite DB
         self.con = None  # MySQL connector
         self.cur = None  # MySQL cursor
+        self.readOnly = readOnly    # The connections refuse the writes
+        self.pragmas = [ ("cache_size", cacheSize), ("mmap_size", mmapSize), ("temp_store", tempStore) ]
         
         # Connect to SQLite DB file with the detector configuration
         # This block would have to be changed when changing to MySQL DB
@@ -35,11 +109,75 @@ class sqliteDB(object):
             print "Cannot find the file <{0}>. Exiting...".format(self.fileName)
             sys.exit(-1)
             
-        self.con = lite.connect(self.fileName)
-        self.con.row_factory = lite.Row
+        self.con = self.makeConnection()
         self.curs = self.con.cursor()
         return
     
+    
+    def makeConnection(self):
+        '''
+        Open a new connection to the DB file with the settings of this object, 
+        the rows are given as lite.Row
+        '''
+        con = self.openConnection( self.readOnly )
+        con.row_factory = lite.Row
+        for (pragmaName, pragmaValue) in self.pragmas:
+            if( pragmaValue != None ):
+                con.execute( "PRAGMA {0} = {1}".format( pragmaName, pragmaValue ) )
+        return con
+    
+    def makeConnectionPool(self):
+        '''
+        Return a pool that gives each thread its own connection with the settings 
+        of this object, sqlite3 connections cannot be shared by the threads
+        '''
+        return threadConnectionPool( self.makeConnection )
+    
+    
+    def openConnection(self, readOnly):
+        '''
+        Return the connection to the DB file. The read-only connections open the file 
+        through a URI with mode=ro and immutable=1, so SQLite takes no locks and does not 
+        check for changes, nothing may write into the file while it is open. If SQLite 
+        does not take the URIs, the file is opened normally and the writes are refused 
+        with the query_only PRAGMA.
+        '''
+        if( not readOnly ):
+            return lite.connect( self.fileName )
+        if( sqliteDB.hasURISupport() ):
+            return lite.connect( "file:{0}?mode=ro&immutable=1".format( urllib.quote( os.path.abspath( self.fileName ) ) ) )
+        con = lite.connect( self.fileName )
+        con.execute( "PRAGMA query_only = ON" )
+        return con
+    
+    
+    def checkQueryPlans(self, printWarnings=True):
+        '''
+        Ask SQLite for the plans of the hotQueries and return the entries of the 
+        queries that would scan the whole detector_hierarchy table instead of using an index 
+        '''
+        scanningQueries = []
+        for (sql, indexName, indexColumns) in sqliteDB.hotQueries:
+            queryPlan = self.con.execute( "EXPLAIN QUERY PLAN " + sql, (0,) * sql.count( "?" ) ).fetchall()
+            for planRow in queryPlan:
+                # The last column has the details like "SCAN TABLE detector_hierarchy" or "SEARCH detector_hierarchy USING INDEX ..."
+                if( planRow[-1].startswith( "SCAN" ) and "detector_hierarchy" in planRow[-1] ):
+                    if( printWarnings ):
+                        print "Warning: <{0}> scans the whole table, an index on detector_hierarchy {1} is missing in <{2}>".format( sql, indexColumns, self.fileName )
+                    scanningQueries.append( (sql, indexName, indexColumns) )
+                    break
+        return scanningQueries
+    
+    
+    def getTupleCursor(self):
+        '''
+        Return a new cursor that gives the rows as plain tuples, it is faster for the 
+        bulk reads where the columns are selected explicitly and read by position
+        '''
+        tupleCursor = self.con.cursor()
+        tupleCursor.row_factory = None
+        return tupleCursor
+    
 
 
        
@@ -57,7 +195,59 @@ class sqliteDB(object):
             print detector
             retMap[detector["name"]] = detector
         return retMap
-        
+    
+    
+    def loadHierarchyIndex(self) :
+        """
+        Read the whole detector_hierarchy table with a single query and return a map 
+        from parent_id to the list of rows of the children. The detectors are the 
+        rows that are stored under the None key. 
+        """
+        self.curs.execute( "SELECT * FROM detector_hierarchy" )
+        rowIndex = {}
+        for row in self.curs.fetchall() :
+            rowIndex.setdefault( row["parent_id"], [] ).append( row )
+        return rowIndex
+    
+    
+    def getSubtreeStamp(self, rowIndex, topRow) :
+        """
+        Return [latest mtime, number of rows] for the rows in the subtree under topRow 
+        in the index made by loadHierarchyIndex. The stamp changes when a row of the 
+        subtree is modified, added or removed.
+        """
+        latestTime = None
+        nRows = 0
+        workList = [ topRow ]
+        while( len(workList) > 0 ):
+            row = workList.pop()
+            nRows += 1
+            if( row["mtime"] != None and ( latestTime == None or row["mtime"] > latestTime ) ):
+                latestTime = row["mtime"]
+            workList.extend( rowIndex.get( row["id"], [] ) )
+        return [latestTime, nRows]
+    
+    
+    def loadHierarchy(self) :
+        """
+        Read the whole detector_hierarchy table with a single query and build the 
+        subsystem trees for all detectors from it in memory. Returns a map with the 
+        detector names as keys and the corresponding subsystem objects as values. 
+        """
+        rowIndex = self.loadHierarchyIndex()
+        retMap = {}
+        for detector in rowIndex.get( None, [] ) :
+            retMap[detector["name"]] = subsystem( None, detector["id"], None, detector, rowIndex )
+        return retMap
+
+
+    def loadHierarchyTable(self) :
+        """
+        Read the whole detector_hierarchy table with a single query into a
+        hierarchyTable, which keeps the rows in columns instead of objects
+        """
+        return hierarchyTable.fromCursor( self.getTupleCursor() )
+
 
 if __name__ == '__main__':    
     args = sys.argv[1:]
@@ -20,15 +20,43 @@ class subsystem(namedAlarmComponent):
     '''
     Class to handle a node in the detector hierarchy 
     '''
+    __slots__ = ("id", "parent_id", "type", "chanid", "mtime", "curs", "rowIndex", "beastID", "lazy")
     
     # Prefix for the EPICS PV variables
 #    pvPrefix = "cj"
     pvPrefix = ""
 
-    def __init__(self, inCursor=None, sqlDetID=None, parent=None):
+    @classmethod
+    def fromRows(cls, rows, sqlDetID):
+        """
+        Build the tree for the detector element with id sqlDetID from a list of 
+        detector_hierarchy rows that were already read from the DB. The rows are 
+        indexed by parent_id once, so the whole tree is built without any queries.
+        """
+        rowIndex = {}
+        detRow = None
+        for row in rows:
+            if( row["id"] == sqlDetID ):
+                if( detRow != None ):
+                    errMsg = "Too many detectors with id {0}".format(sqlDetID)
+                    print errMsg
+                    raise Exception( errMsg )
+                detRow = row
+            rowIndex.setdefault( row["parent_id"], [] ).append( row )
+        if( detRow == None ):
+            errMsg = "Bad detector hierarchy <{0}>".format( sqlDetID )
+            print errMsg
+            raise Exception( errMsg )
+        return cls( None, sqlDetID, None, detRow, rowIndex )
+
+
+    def __init__(self, inCursor=None, sqlDetID=None, parent=None, detRow=None, rowIndex=None, buildTree=True, lazy=False):
         '''
-        Constructor for the class. Creates the object, then to create objects for the children.
-        That function will call the constructor for children, so the process will go recursively. 
+        Constructor for the class. Creates the object, then builds the tree of its children 
+        unless buildTree is False. If the detector_hierarchy row is given in detRow it is 
+        used instead of querying the DB, and if rowIndex (map from parent_id to the list of children rows) is given the children 
+        are taken from it instead of the DB. With lazy the children are only read from the DB 
+        the first time they are asked for, and they load their own children the same way.
         '''
         namedAlarmComponent.__init__(self, None, parent)
         self.id         = None      # id in the detector hierarchy DB
@@ -39,23 +67,27 @@ class subsystem(namedAlarmComponent):
         self.mtime      = None      # mtime (modification time) in the detector hierarchy tree
         
         self.curs       = inCursor  # cursor for the DB connector 
+        self.rowIndex   = rowIndex  # map from parent_id to the children rows, if the rows were loaded in bulk
 #         self.children   = []        # A list with the children of this object taken from the detector hierarchy DB
 #         self.parentSys  = parent    # Reference to the parent object of the same class as self
         self.beastID    = None      # id that will correspond to this element in the MySQL DB for BEAST
+        self.lazy       = lazy      # The children are loaded on the first access
         
-        # Find the fields for this detector element to assign the data members
-        self.curs.execute( "SELECT * FROM detector_hierarchy WHERE id=?", (sqlDetID,) )
-        allDetectors = self.curs.fetchall()
-        
-        # Raise an exception if there are too many rows from the previous SQL 
-        # There has to be only one entry in the table for each unique id
-        if( len( allDetectors ) > 1 ):
-            errMsg = "Too many detectors with id {0}, to be exact there are {1}".format(sqlDetID, len(allDetectors) )
-            print errMsg
-            raise Exception( errMsg )
-        
-        # Find the first detector_hierarchy raw in the DB 
-        detector = allDetectors[0]
+        detector = detRow
+        if( detector == None ):
+            # Find the fields for this detector element to assign the data members
+            self.curs.execute( "SELECT * FROM detector_hierarchy WHERE id=?", (sqlDetID,) )
+            allDetectors = self.curs.fetchall()
+            
+            # Raise an exception if there are too many rows from the previous SQL 
+            # There has to be only one entry in the table for each unique id
+            if( len( allDetectors ) > 1 ):
+                errMsg = "Too many detectors with id {0}, to be exact there are {1}".format(sqlDetID, len(allDetectors) )
+                print errMsg
+                raise Exception( errMsg )
+            
+            # Find the first detector_hierarchy raw in the DB 
+            detector = allDetectors[0]
 #        print "Creating a detector with {0} elements and id {1}".format(len(detector), sqlDetID)
 #        (self.id, self.parent_id, self.name, self.type,  self.chanid, dummy) = detector
         self.id         = detector["id"]
@@ -72,9 +104,14 @@ class subsystem(namedAlarmComponent):
             raise Exception( errMsg )
  
         # Keep going to find the children
-        self.children   = self.findChildren()
-        if( len(self.children) == 0 ) :
-            self.name = self.name + ":alarm"
+        if( lazy ):
+            # Only need to know if this is a bottom node, its name depends on it
+            if( self.hasChildRows( detector ) ):
+                self.setPendingChildren()
+            else:
+                self.markAsLeaf()
+        elif( buildTree ):
+            self.buildSubtree()
         return
         
     
@@ -98,24 +135,54 @@ class subsystem(namedAlarmComponent):
         
                 
     def findChildren(self):
-        """Finds children of this detector. Note that this function will create other 
-        objects of this class which will in turn call this function. The recursive process 
-        continues until we reach an object with no children found and the functions start returning"""
+        """Finds children of this detector and builds the whole tree below it. 
+        The tree is built with a worklist, so there is no recursion and 
+        cycles in the parent_id column are reported with an exception"""
+        return self.buildSubtree()
+
+
+    def findChildItems(self):
+        return self.findChildRows()
+
+    def makeChild(self, childRow):
+        return subsystem( self.curs, childRow["id"], self, childRow, self.rowIndex, False, self.lazy )
+
+    def markAsLeaf(self):
+        """ The bottom nodes of the tree are the alarm PVs """
+        self.name = self.name + ":alarm"
+        return
+
+    def getTreeKey(self):
+        return self.id
+
+
+    def findChildRows(self):
+        """Return the detector_hierarchy rows with the parent_id column matching 
+        the id of this object. The rows are taken from the bulk-loaded index if 
+        there is one, otherwise they are queried from the DB"""
+        if( self.rowIndex != None ):
+            return self.rowIndex.get( self.id, [] )
         # Search for all the raws in the detector_hierarchy with the parent_id column matching 
         # the self.parent_id of this object
 #        self.curs.execute( "SELECT * FROM detector_hierarchy WHERE parent_id IS %s" %(self.id) )
+        if( self.lazy ):
+            # The lazily loaded children need to know if they have children of their own
+            self.curs.execute( "SELECT parent.*, EXISTS (SELECT 1 FROM detector_hierarchy AS child WHERE child.parent_id=parent.id) AS hasChildren "
+                               "FROM detector_hierarchy AS parent WHERE parent.parent_id=?", (self.id,) )
+            return self.curs.fetchall()
         self.curs.execute( "SELECT * FROM detector_hierarchy WHERE parent_id=?", (self.id,) )
-        childRows = self.curs.fetchall()
-#        print "Found {0} children for parent with id {1}".format( len(childRows), self.id )
-
-        # Create objects for the children
-        childList = []        
-        for child in childRows:
-            childID = child["id"]
-            newSubsystem = subsystem( self.curs, childID, self ) 
-            childList.append(newSubsystem)
-        return childList
+        return self.curs.fetchall()
 
+    def hasChildRows(self, detRow):
+        """Return True if the detector element has children. The rows read by findChildRows 
+        in the lazy mode already have this in the hasChildren column, otherwise the index 
+        or the DB is checked without reading the children"""
+        if( self.rowIndex != None ):
+            return len( self.rowIndex.get( self.id, [] ) ) > 0
+        if( "hasChildren" in detRow.keys() ):
+            return detRow["hasChildren"] != 0
+        self.curs.execute( "SELECT EXISTS (SELECT 1 FROM detector_hierarchy WHERE parent_id=?)", (self.id,) )
+        return self.curs.fetchone()[0] != 0
 
 
     
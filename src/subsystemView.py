@@ -0,0 +1,57 @@
+'''
+Created on October 18, 2026
+
+This file contains a class that looks like a subsystem, but takes its
+data from a row of a hierarchyTable. The children are only made when
+they are asked for, so only the accessed part of the tree is made of objects.
+
+@author: Hovanes Egiyan
+'''
+
+from namedAlarmComponent import namedAlarmComponent
+from subsystem import subsystem
+
+
+class subsystemView(subsystem):
+    '''
+    Class to handle a node in the detector hierarchy stored in a hierarchyTable
+    '''
+    __slots__ = ("table", "position")
+
+    def __init__(self, table, position, parent=None):
+        '''
+        Constructor for the class. The views are made by hierarchyTable.getView,
+        which keeps one view per row.
+        '''
+        namedAlarmComponent.__init__(self, table.getName( position ), parent)
+        self.table          = table     # hierarchyTable with the row
+        self.position       = position  # Position of the row in the table
+        self.id             = table.ids[position]
+        self.parent_id      = table.getParentID( position )
+        self.type           = table.types[position]
+        self.chanid         = table.getChanid( position )
+        self.mtime          = table.mtimes[position]
+        self.curs           = None
+        self.rowIndex       = None
+        self.beastID        = None
+        self.lazy           = True
+        if( not table.isLeaf( position ) ):
+            self.setPendingChildren()
+        return
+
+
+    def findChildren(self):
+        """ The children come from the table, there is nothing to build """
+        return self.children
+
+    def findChildItems(self):
+        return self.table.getChildPositions( self.position )
+
+    def makeChild(self, childPosition):
+        return self.table.getView( childPosition )
+
+    def markAsLeaf(self):
+        """ The table already gives the names of the bottom rows with the alarm suffix """
+        return
+
+# End of "subsystemView" class definition